@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Headless batch generator: writes many songs without prompts, plots or Max.
+
+Song number n is generated with the random seed --seed + n, so every song
+of a batch can be regenerated on its own, e.g.
+
+    python batch.py --count 1000 --seed 5000 --outdir out/ --workers 8
+    python batch.py --count 1 --seed 5042 --outdir out/    # song 5042 again
+
+For every seed, out/song_<seed>.txt holds the lyrics and out/song_<seed>.wav
+the rendered melody and bassline; --png and --csv add the plot of the
+melody and bassline as song_<seed>.png and song_<seed>.csv. The models are
+trained once (or read from --models) before the worker processes are
+started, which then share them instead of training their own copies.
+
+--metrics run.json and --prometheus run.prom write the time spent in
+every stage (training, generation, rendering, export) and counters such
+as the n-gram backoffs and the samples rendered, summed over all workers.
+"""
+import sys
+sys.dont_write_bytecode = True # Suppress .pyc files
+import os
+import time
+import itertools
+import random
+import argparse
+import multiprocessing
+import generate
+from generate import KEY_SIGNATURES
+import metrics
+
+# loaded in the parent, handed to the workers by initWorker
+lyricModels = None
+musicModels = None
+
+def initWorker(lyrics, music, recording):
+    """
+    Requires: lyrics and music are lists of trained models, recording is
+              a bool
+    Modifies: lyricModels, musicModels, metrics
+    Effects:  sets up a worker process: the models, and metrics recording
+              like in the parent. The arguments are passed by the Pool, so
+              this works with every start method; with fork they are
+              inherited and not copied.
+    """
+    global lyricModels, musicModels
+    lyricModels = lyrics
+    musicModels = music
+    metrics.enable(recording)
+
+def generateOne(job):
+    """
+    Requires: job is a tuple (seed, options) with the parsed command line
+              options; the models have been loaded
+    Modifies: the output files of this seed
+    Effects:  generates the song for seed and returns (seed, key, files,
+              metrics), metrics being the snapshot of the timings and
+              counters of this song when it ran in a worker process with
+              metrics enabled, else None.
+    """
+    seed, options = job
+    worker = multiprocessing.current_process().name != 'MainProcess'
+    if worker:
+        # a forked worker starts with the parent's metrics, send only its own
+        metrics.reset()
+    random.seed(seed)
+    base = os.path.join(options.outdir, 'song_%d' % seed)
+    files = []
+    key = None
+    if options.lyrics:
+        verses = generate.generateLyrics(lyricModels)
+        with open(base + '.txt', 'w') as f:
+            f.write(generate.formatSongLyrics(*verses))
+        files.append(base + '.txt')
+    if options.music:
+        import numpy as np # pysynth_s plucks with numpy's random noise
+        np.random.seed(seed % 2**32)
+        key, melody, bassline = generate.generateSong(musicModels, options.key)
+        plots = [f for f in ('png', 'csv') if getattr(options, f)]
+        if plots:
+            # exported in the background while the song is rendered
+            exporting = generate.exportGraphsAsync(
+                generate.createPointList(
+                    generate.fixStupidDurations(melody), base, 'melody'),
+                generate.createPointList(
+                    generate.fixStupidDurations(bassline), base, 'bassline'),
+                base + '.wav', plots)
+        generate.renderSong(melody, bassline, base + '.wav',
+                            generate.loadEngine(options.engine),
+                            options.preview,
+                            silent=True)
+        files.append(base + '.wav')
+        if plots:
+            files.extend(exporting.get())
+    if worker and metrics.enabled:
+        return seed, key, files, metrics.snapshot()
+    return seed, key, files, None
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--count', type=int, default=1,
+                        help='number of songs (default 1)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first song (default 0)')
+    parser.add_argument('--outdir', default=generate.WAVDIR,
+                        help='output directory (default %(default)s)')
+    parser.add_argument('--key', choices=sorted(KEY_SIGNATURES),
+                        metavar='KEY', help='key signature, e.g. "c major" '
+                        '(default: a random key per song)')
+    parser.add_argument('--engine', choices=sorted(generate.ENGINES),
+                        default='a',
+                        help='pysynth engine (default a, i.e. pysynth)')
+    parser.add_argument('--lyrics-only', dest='music', action='store_false',
+                        help='generate lyrics only')
+    parser.add_argument('--music-only', dest='lyrics', action='store_false',
+                        help='generate music only')
+    parser.add_argument('--png', action='store_true',
+                        help='plot melody and bassline into a .png image')
+    parser.add_argument('--csv', action='store_true',
+                        help='write melody and bassline to a .csv file')
+    parser.add_argument('--preview', action='store_true',
+                        help='render quick low sample rate previews')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='worker processes (default: one per CPU)')
+    parser.add_argument('--models', metavar='FILE',
+                        help='read the trained models from FILE, or train '
+                        'them and save them there')
+    parser.add_argument('--metrics', metavar='JSON',
+                        help='write stage timings and counters to JSON')
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help='write them to FILE in the Prometheus format')
+    options = parser.parse_args(argv)
+    if not (options.lyrics or options.music):
+        parser.error('--lyrics-only and --music-only exclude each other')
+    return options
+
+def main(argv=None):
+    global lyricModels, musicModels
+    options = parseArgs(argv)
+    if not os.path.isdir(options.outdir):
+        os.makedirs(options.outdir)
+    metrics.enable(bool(options.metrics or options.prometheus))
+
+    start = time.time()
+    lyricModels, musicModels = generate.loadModels(options.models)
+    print 'Models loaded in %.1f s' % (time.time() - start)
+
+    jobs = [(seed, options)
+            for seed in range(options.seed, options.seed + options.count)]
+    workers = options.workers or multiprocessing.cpu_count()
+    start = time.time()
+    pool = None
+    if workers > 1 and len(jobs) > 1:
+        pool = multiprocessing.Pool(min(workers, len(jobs)), initWorker,
+                                    (lyricModels, musicModels,
+                                     metrics.enabled))
+        results = pool.imap_unordered(generateOne, jobs)
+    else:
+        results = itertools.imap(generateOne, jobs)
+    for n, (seed, key, files, snapshot) in enumerate(results):
+        if snapshot is not None:
+            metrics.merge(snapshot)
+        print '[%d/%d] seed %d%s: %s' % (n + 1, len(jobs), seed,
+                                         ' (%s)' % key if key else '',
+                                         ', '.join(files))
+    if pool is not None:
+        pool.close()
+        pool.join()
+    elapsed = time.time() - start
+    print '%d songs in %.1f s' % (len(jobs), elapsed)
+    generate.writeMetrics(options.metrics, options.prometheus,
+                          songs=len(jobs), workers=workers, seconds=elapsed)
+
+if __name__ == '__main__':
+    main()
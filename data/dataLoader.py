@@ -2,7 +2,9 @@
 import os
 import re
 import string
+import metrics
 
+@metrics.timed('loadLyrics')
 def loadLyrics(dirName):
     """
     Loads the lyrics files from the directory specified by dirName,
@@ -30,8 +32,10 @@ def loadLyrics(dirName):
             line = line.lower().strip()
             if line:
                 lyrics.append(line.split())
+    metrics.count('lyric_lines_loaded', len(lyrics))
     return lyrics
 
+@metrics.timed('loadMusic')
 def loadMusic(dirName):
     """
     Loads the midi files to the specified dirName directory by
@@ -75,6 +79,7 @@ def loadMusic(dirName):
 
         if song:
             songs.append(song)
+            metrics.count('music_notes_loaded', len(song))
     return songs
 
 def formatPitch(asciiPitch):
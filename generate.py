@@ -1,22 +1,49 @@
 #!/usr/bin/env python
 import sys
 sys.dont_write_bytecode = True # Suppress .pyc files
+import os
+import csv
+import time
+import heapq
 import socket
 import random
-from pysynth import pysynth
-from pysynth import mixfiles
+import cPickle as pickle
+import subprocess
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import metrics
+from pysynth import hooks
 from data.dataLoader import *
 from models.musicInfo import *
 from models.unigramModel import *
 from models.bigramModel import *
 from models.trigramModel import *
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
+# numpy, matplotlib and pysynth (whose tables need numpy) take most of the
+# startup time, so they are imported in the functions that use them
+
+# pysynth reports the timings and counters of its stages into metrics
+hooks.install(metrics)
 
 TEAM = '~G L Y T C H~'
 LYRICSDIRS = ['funkadelic']
 MUSICDIRS = ['gamecube']
 WAVDIR = 'wav/'
+MAX_HOST = '127.0.0.1'
+MELODY_PORT = 7000
+BASS_PORT = 7001
+CHORD_PORT = 4500
+# pysynth engines by their letter, 'a' is pysynth itself
+ENGINES = {
+    'a': 'pysynth',
+    'b': 'pysynth_b',
+    'e': 'pysynth_e',
+    's': 'pysynth_s',
+    'w': 'pysynth_w',
+}
+# seconds that 'import generate' may take, see checkStartup()
+STARTUP_BUDGET = .1
+# modules 'import generate' must not load
+HEAVY_MODULES = ['numpy', 'matplotlib', 'pysynth.tables']
 
 ###############################################################################
 # Helper Functions
@@ -34,18 +61,29 @@ def sentenceTooLong(desiredLength, currentLength):
     val = random.gauss(currentLength, STDEV)
     return val > desiredLength
 
-def printSongLyrics(verseOne, verseTwo, chorus):
+def formatSongLyrics(verseOne, verseTwo, chorus):
     """
     Requires: verseOne, verseTwo, and chorus are lists of lists of strings
     Modifies: nothing
-    Effects:  prints the song. This function is done for you.
+    Effects:  returns the song as a str, one line per sentence and a
+              blank line after each verse.
     """
     verses = [verseOne, chorus, verseTwo, chorus]
-    print
+    text = ''
     for verse in verses:
         for line in verse:
-            print (' '.join(line)).capitalize()
-        print
+            text += (' '.join(line)).capitalize() + '\n'
+        text += '\n'
+    return text
+
+def printSongLyrics(verseOne, verseTwo, chorus):
+    """
+    Requires: verseOne, verseTwo, and chorus are lists of lists of strings
+    Modifies: nothing
+    Effects:  prints the song. This function is done for you.
+    """
+    print
+    sys.stdout.write(formatSongLyrics(verseOne, verseTwo, chorus))
 
 def trainLyricModels(lyricDirs):
     """
@@ -63,7 +101,8 @@ def trainLyricModels(lyricDirs):
     for ldir in lyricDirs:
         lyrics = loadLyrics(ldir)
         for model in models:
-            model.trainModel(lyrics)
+            with metrics.timer('trainModel'):
+                model.trainModel(lyrics)
     return models
 
 ###############################################################################
@@ -86,9 +125,33 @@ def trainMusicModels(musicDirs):
     for mdir in musicDirs:
         music = loadMusic(mdir)
         for model in models:
-            model.trainModel(music)
+            with metrics.timer('trainModel'):
+                model.trainModel(music)
     return models
 
+def loadModels(path=None):
+    """
+    Requires: path is None or the name of a pickle file
+    Modifies: the file at path, if it does not exist yet
+    Effects:  returns (lyricModels, musicModels) trained on LYRICSDIRS and
+              MUSICDIRS. If path is given and exists, the models are read
+              from it instead of being trained; otherwise the freshly
+              trained models are saved there, so that later runs can
+              skip the training. Both ways return the models read back
+              from the pickle, so a seed generates the same song either way
+              (the order of the model dictionaries changes when they are
+              unpickled).
+    """
+    if path is not None and os.path.exists(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    models = (trainLyricModels(LYRICSDIRS), trainMusicModels(MUSICDIRS))
+    data = pickle.dumps(models, pickle.HIGHEST_PROTOCOL)
+    if path is not None:
+        with open(path, 'wb') as f:
+            f.write(data)
+    return pickle.loads(data)
+
 def selectNGramModel(models, sentence):
     """
     Requires: models is a list of NGramModel objects sorted by descending
@@ -100,12 +163,16 @@ def selectNGramModel(models, sentence):
               be used to pick a word for a sentence!)
     """
     if models[0].trainingDataHasNGram(sentence) == True:
+        metrics.count('backoff_trigram')
         return models[0]
     elif models[1].trainingDataHasNGram(sentence) == True:
+        metrics.count('backoff_bigram')
         return models[1]
     else:
+        metrics.count('backoff_unigram')
         return models[2]
 
+@metrics.timed('generateLyricalSentence')
 def generateLyricalSentence(models, desiredLength):
     """
     Requires: models is a list of trained NGramModel objects sorted by
@@ -131,6 +198,7 @@ def generateLyricalSentence(models, desiredLength):
             #append the next suggested character to the sentence
             sentence.append(next_word)            
     return sentence[2:]
+@metrics.timed('generateMusicalSentence')
 def generateMusicalSentence(models, desiredLength, possiblePitches):
     """
     Requires: possiblePitches is a list of pitches for a musical key
@@ -150,12 +218,12 @@ def generateMusicalSentence(models, desiredLength, possiblePitches):
             sentence.append(next_note)
     return sentence[2:]
 
-def runLyricsGenerator(models):
+def generateLyrics(models):
     """
     Requires: models is a list of a trained nGramModel child class objects
     Modifies: nothing
-    Effects:  generates a verse one, a verse two, and a chorus, then
-              calls printSongLyrics to print the song out.
+    Effects:  generates a verse one, a verse two, and a chorus and returns
+              them as a tuple of lists of sentences.
     """
     verseOne = []
     verseTwo = []
@@ -176,31 +244,121 @@ def runLyricsGenerator(models):
     chorus.append(generateLyricalSentence(models, 6))
     chorus.append(generateLyricalSentence(models, 6))
 
+    return verseOne, verseTwo, chorus
+
+def runLyricsGenerator(models):
+    """
+    Requires: models is a list of a trained nGramModel child class objects
+    Modifies: nothing
+    Effects:  generates a verse one, a verse two, and a chorus, then
+              calls printSongLyrics to print the song out.
+    """
+    verseOne, verseTwo, chorus = generateLyrics(models)
     printSongLyrics(verseOne, verseTwo, chorus)
     return
 
-def runMusicGenerator(models, songName):
+def generateSong(models, key=None):
+    """
+    Requires: models is a list of trained models
+              key is None or a key of KEY_SIGNATURES
+    Modifies: nothing
+    Effects:  returns (key, melody, bassline) of a new song. If no key is
+              given, a random one is chosen.
+    """
+    if key is None:
+        key = random.choice(KEY_SIGNATURES.keys())
+    note_list = KEY_SIGNATURES[key]
+    melody = createMelody(models, note_list)
+    bassline = createBassLine(models, note_list)
+    return key, melody, bassline
+
+def loadEngine(name):
+    """
+    Requires: name is a key of ENGINES
+    Modifies: nothing
+    Effects:  returns the pysynth engine module called name.
+    """
+    module = ENGINES[name]
+    return getattr(__import__('pysynth.' + module), module)
+
+@metrics.timed('renderSong')
+def renderSong(melody, bassline, songName, engine=None, preview=False,
+               silent=False, processes=1, pool=None):
+    """
+    Requires: melody and bassline are lists of tuples in form (pitch, duration)
+              engine is a pysynth engine module, None for pysynth
+              processes is the number of processes rendering the parts,
+              0 for one per CPU
+              pool is None or a multiprocessing Pool to render the parts
+              in instead
+    Modifies: the file songName
+    Effects:  renders melody and bassline into one stereo .wav file, the
+              melody panned right and the bassline panned left. With
+              more than one process both parts are rendered at the same
+              time.
+    """
+    from pysynth import multitrack
+    if engine is None:
+        engine = loadEngine('a')
+    multitrack.render_tracks([(melody, engine, 1., .4),
+                              (bassline, engine, 1., -.4)], fn=songName,
+                             preview=preview, silent=silent,
+                             processes=processes, pool=pool)
+
+def runMusicGenerator(models, songName, preview=False, live=False,
+                      plots=None):
     """                                          
     Requires: models is a list of trained models
+              preview is a bool, True renders a quick low sample rate preview
+              live is a bool, True streams the notes to max/msp in real
+              time (see streamToMax) instead of sending them all at once
+              plots is None to show the plot in a window, or a list of
+              formats ('png', 'csv') to export it to in the background
+              (see exportGraphsAsync)
     Modifies: nothing
     Effects:  runs the music generator. this now involves choosing key signature,
-              creating melody and bassline, adjusting durations, sending all relevant 
-              info to max/msp, and plotting the trajectories of melody and bassline. 
+              creating melody and bassline, rendering both into one stereo .wav,
+              adjusting durations, sending all relevant info to max/msp, and
+              plotting the trajectories of melody and bassline. 
+
+              The melody and bassline are rendered at the same time (given
+              two CPUs) in the background, while the notes are sent to
+              max/msp and plotted.
     """
-    key = random.choice(KEY_SIGNATURES.keys())
+    key, melody, bassline = generateSong(models)
     print 'Key:', key
-    note_list = KEY_SIGNATURES[key]
-    determineMajMin(note_list, key, 4500)
-    melody = createMelody(models, songName, note_list)
-    bassline = createBassLine(models, songName, note_list)
-    pysynth.mix_files(songName + "_melody.wav", songName + "_bassLine.wav", songName)
-    fixed_melody = fixStupidDurations(melody)
-    fixed_bassline = fixStupidDurations(bassline)
-    sendToMax(fixed_melody, 7000)
-    sendToMax(fixed_bassline, 7001)
-    melody_graph = createPointList(fixed_melody, songName, 'melody')
-    bassline_graph = createPointList(fixed_bassline, songName, 'bassline')
-    plottwoListGraphs(melody_graph, bassline_graph, songName)
+    # the render processes are forked here, before the render thread is
+    # started: a child forked from a thread inherits the locks that other
+    # threads hold at that moment and can block on them forever
+    workers = None
+    if multiprocessing.cpu_count() > 1:
+        workers = multiprocessing.Pool(2)
+    try:
+        renderer = ThreadPool(1)
+        rendering = renderer.apply_async(renderSong,
+                                         (melody, bassline, songName),
+                                         {'preview': preview,
+                                          'pool': workers})
+        renderer.close()
+        determineMajMin(KEY_SIGNATURES[key], key, CHORD_PORT)
+        fixed_melody = fixStupidDurations(melody)
+        fixed_bassline = fixStupidDurations(bassline)
+        if live:
+            streamToMax(fixed_melody, fixed_bassline)
+        else:
+            sendToMax(fixed_melody, MELODY_PORT)
+            sendToMax(fixed_bassline, BASS_PORT)
+        melody_graph = createPointList(fixed_melody, songName, 'melody')
+        bassline_graph = createPointList(fixed_bassline, songName, 'bassline')
+        if plots is None:
+            plottwoListGraphs(melody_graph, bassline_graph, songName)
+        else:
+            exportGraphsAsync(melody_graph, bassline_graph, songName, plots)
+        rendering.get() # re-raises an error of the render
+        renderer.join()
+    finally:
+        if workers is not None:
+            workers.terminate()
 
     
 
@@ -209,6 +367,102 @@ def runMusicGenerator(models, songName):
 # Reach
 ###############################################################################
 
+# seconds of a clock that never jumps (CLOCK_MONOTONIC on Linux)
+monotonic = metrics.monotonic
+
+class MaxSender(object):
+    """
+    Sends pairs of numbers to the udpreceive objects in MusicGen.maxpat over
+    one UDP socket, many pairs per datagram.
+
+    Every send starts with a 'clear' datagram. The pairs follow in as few
+    datagrams as possible, each of the form
+
+        batch a1 b1 a2 b2 ...
+
+    In the patch, each receiver goes into [route batch]: its left outlet
+    feeds [zl iter 2], which splits the list into 'a b' pairs for the text
+    or coll object, and its right outlet passes 'clear' (and single
+    'a b' messages of older senders) on unchanged. A datagram stays below
+    the Ethernet MTU and holds at most 120 pairs, since zl only takes
+    lists of up to 256 elements by default.
+    """
+
+    MAX_DATAGRAM = 1400
+    MAX_PAIRS = 120
+
+    def __init__(self, host=MAX_HOST):
+        """
+        Requires: host is the address of the computer running Max/MSP
+        Modifies: self
+        Effects:  opens the UDP socket used for all sends.
+        """
+        self.host = host
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.datagrams = 0
+
+    def pack(self, pairs):
+        """
+        Requires: pairs is a list of pairs of ints
+        Modifies: nothing
+        Effects:  returns the list of 'batch ...' datagrams holding pairs.
+        """
+        packets = []
+        packet = 'batch'
+        count = 0
+        for a, b in pairs:
+            item = ' %d %d' % (a, b)
+            if count == self.MAX_PAIRS or \
+               len(packet) + len(item) > self.MAX_DATAGRAM:
+                packets.append(packet)
+                packet = 'batch'
+                count = 0
+            packet += item
+            count += 1
+        if count:
+            packets.append(packet)
+        return packets
+
+    def send(self, pairs, port):
+        """
+        Requires: pairs is a list of pairs of ints
+                  port is the port of a udpreceive object in max
+        Modifies: the object behind port in max/msp
+        Effects:  clears the object and sends it pairs.
+        """
+        packets = ['clear'] + self.pack(pairs)
+        for packet in packets:
+            self.sock.sendto(packet, (self.host, port))
+        self.datagrams += len(packets)
+        metrics.count('max_datagrams', len(packets))
+
+    def play(self, pitch, duration, port):
+        """
+        Requires: pitch is a midi note, duration is in 32nd notes
+                  port is the port of a udpreceive object in max
+        Modifies: the object behind port in max/msp
+        Effects:  sends 'play pitch duration', a note to be played now.
+        """
+        self.sock.sendto('play %d %d' % (pitch, duration), (self.host, port))
+        self.datagrams += 1
+
+    def close(self):
+        self.sock.close()
+
+_maxSender = None
+
+def getMaxSender():
+    """
+    Requires: nothing
+    Modifies: _maxSender
+    Effects:  returns the MaxSender shared by sendToMax and determineMajMin,
+              which is created on first use.
+    """
+    global _maxSender
+    if _maxSender is None:
+        _maxSender = MaxSender()
+    return _maxSender
+
 def plottwoListGraphs(melody_list, bass_list, songName):
     """
     Requires: melody_list and bass_list are lists of ints
@@ -217,6 +471,7 @@ def plottwoListGraphs(melody_list, bass_list, songName):
     Modifies: nothing
     Effects:  plots the trajectory of two lists on one figure
     """
+    import matplotlib.pyplot as plt
     plt.title(songName[4:] + " ")
     melody, = plt.plot(melody_list, label='melody')
     bassline, = plt.plot(bass_list, 'o-', label='bassline')
@@ -226,7 +481,76 @@ def plottwoListGraphs(melody_list, bass_list, songName):
     plt.show()
 
 
-def determineMajMin(list, key, port):
+@metrics.timed('exportGraphs')
+def exportGraphs(melody_list, bass_list, songName, formats=('png', 'csv')):
+    """
+    Requires: melody_list and bass_list are lists of ints
+              songName is a str
+              formats is a list of 'png' and/or 'csv'
+    Modifies: the files songName with the extension .png and .csv
+    Effects:  writes the plot of plottwoListGraphs as a .png image and/or
+              the two trajectories as .csv columns, one row per 32nd note.
+              Returns the list of files written. Uses matplotlib's Agg
+              backend directly, so it needs no display and is safe to run
+              outside of the main thread.
+    """
+    base = os.path.splitext(songName)[0]
+    files = []
+    if 'png' in formats:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        axes.set_title(os.path.basename(songName) + " ")
+        melody, = axes.plot(melody_list, label='melody')
+        bassline, = axes.plot(bass_list, 'o-', label='bassline')
+        axes.set_xlim([0, (len(melody_list) - 1)])
+        axes.legend(handles=[melody, bassline], loc=0)
+        figure.savefig(base + '.png')
+        files.append(base + '.png')
+    if 'csv' in formats:
+        with open(base + '.csv', 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(['tick', 'melody', 'bassline'])
+            for i in range(max(len(melody_list), len(bass_list))):
+                writer.writerow([i,
+                                 melody_list[i] if i < len(melody_list) else '',
+                                 bass_list[i] if i < len(bass_list) else ''])
+        files.append(base + '.csv')
+    return files
+
+_plotExporter = None
+
+def exportGraphsAsync(melody_list, bass_list, songName, formats=('png', 'csv')):
+    """
+    Requires: the same as exportGraphs
+    Modifies: _plotExporter, the exported files
+    Effects:  runs exportGraphs in a background thread and returns at once.
+              Exports run one at a time in the order they were started.
+              Returns a multiprocessing AsyncResult, whose get() waits for
+              the files and re-raises an error of the export. The thread
+              does not keep the program running; see waitForExports().
+    """
+    global _plotExporter
+    if _plotExporter is None:
+        _plotExporter = ThreadPool(1)
+    return _plotExporter.apply_async(exportGraphs, (melody_list, bass_list,
+                                                    songName, formats))
+
+def waitForExports():
+    """
+    Requires: nothing
+    Modifies: _plotExporter
+    Effects:  waits until all exports started by exportGraphsAsync are done.
+    """
+    global _plotExporter
+    if _plotExporter is not None:
+        _plotExporter.close()
+        _plotExporter.join()
+        _plotExporter = None
+
+def determineMajMin(list, key, port, sender=None):
     """
     Requires: list is a key signature from KEY_SIGNATURES
               key is a str such as c major, g# minor, etc
@@ -243,62 +567,157 @@ def determineMajMin(list, key, port):
                          1, 2, 4, and 5 are minor chords
                          (2 should be diminished)
               This is because of some music theory stuff. 
-            
+
+              The pairs are sent with sender, by default getMaxSender().
     """
-    #opens UDP communication with max/msp
-    UDP_IP = "127.0.0.1"
-    sock = socket.socket(socket.AF_INET, 
-                         socket.SOCK_DGRAM) 
     #builds a list of notes in the key as midi values in octave 2, to match bass notes
     midi_list = []
     for note in list:
         midi_list.append(MidiNoteToInt(note + '2'))
-    #clears the destination text object in max
-    sock.sendto('clear', (UDP_IP, port))
-    #checks if key is major, then sends 0s or 1s along with each scale degree based on chord quality
+    #checks if key is major, then pairs 0s or 1s with each scale degree based on chord quality
+    pairs = []
     if key[-3] == 'j':
         for i in range(len(list)):
             if i == 1 or i == 2 or i == 5 or i == 6:
-                sock.sendto(('%s %s' % (str(midi_list[i]), '0')), (UDP_IP, port))
+                pairs.append((midi_list[i], 0))
             elif i == 0 or i == 3 or i == 4:
-                sock.sendto(('%s %s' % (str(midi_list[i]), '1')), (UDP_IP, port))
+                pairs.append((midi_list[i], 1))
     else:
         for i in range(len(list)):
             if i == 0 or i == 1 or i == 3 or i == 4:
-                sock.sendto(('%s %s' % (str(midi_list[i]), '0')), (UDP_IP, port))
+                pairs.append((midi_list[i], 0))
             elif i == 2 or i == 5 or i == 6:
-                sock.sendto(('%s %s' % (str(midi_list[i]), '1')), (UDP_IP, port))
+                pairs.append((midi_list[i], 1))
+    #clears the destination coll object in max and sends the pairs
+    (sender or getMaxSender()).send(pairs, port)
     
 
-def sendToMax(song, port):
+def sendToMax(song, port, sender=None):
     """
     Requires: song is a list of tuples in form (pitch, duration)
               port is a valid integer UDP port number
               port must also be the same port on max's udpreceive object
     Modifies: the udprecieve object in max/msp
     Effects:  sends song as a list of midi notes with durations to external 
-              program Max/MSP for additional processing and playback
-    """
-    UDP_IP = "127.0.0.1"
-    sock = socket.socket(socket.AF_INET,
-                         socket.SOCK_DGRAM) 
-    sock.sendto('clear', (UDP_IP, port))
-    for note in song:
-        sock.sendto(('%s %s \n') % (MidiNoteToInt(note[0]), note[1]), (UDP_IP, port))
+              program Max/MSP for additional processing and playback, using
+              sender (by default getMaxSender()), see MaxSender.
+    """
+    pitches, durations = songToMidi(song)
+    pairs = zip(pitches.tolist(), durations.tolist())
+    (sender or getMaxSender()).send(pairs, port)
+
+class NoteScheduler(object):
+    """
+    Streams the notes of songs to max/msp while they play: every note is
+    sent as a 'play pitch duration' datagram (see MaxSender.play) at the
+    moment it starts, instead of all notes being sent up front.
+
+    Note start times are computed from the 32nd-note durations of
+    fixStupidDurations and the tempo, relative to the start of playback,
+    and each note is sent at its absolute deadline on a monotonic clock.
+    Late sends therefore never shift the notes that follow (no drift).
+    The scheduler sleeps until shortly before a deadline and then spins,
+    so the send times are accurate to well under a millisecond on an idle
+    machine. The lateness of every send is kept in self.jitter.
+    """
+
+    SPIN = .002 # seconds spent spinning before each deadline
+
+    def __init__(self, bpm=120, sender=None):
+        """
+        Requires: bpm is the tempo in quarter notes per minute
+                  sender is a MaxSender or None for getMaxSender()
+        Modifies: self
+        Effects:  creates a scheduler; 120 bpm matches the rendered .wav.
+        """
+        self.tick = 60. / bpm / 8 # seconds per 32nd note
+        self.sender = sender or getMaxSender()
+        self.jitter = []
+
+    def events(self, parts):
+        """
+        Requires: parts is a list of (song, port) tuples, where song is a
+                  list of (pitch, duration in 32nd notes) tuples
+        Modifies: nothing
+        Effects:  returns the list of (start time in seconds, port, midi
+                  pitch, duration) of all notes, ordered by start time.
+        """
+        import numpy as np
+        streams = []
+        for song, port in parts:
+            pitches, durations = songToMidi(song)
+            starts = np.cumsum(durations) - durations
+            streams.append(zip((starts * self.tick).tolist(),
+                               [port] * len(song), pitches.tolist(),
+                               durations.tolist()))
+        return list(heapq.merge(*streams))
+
+    def play(self, parts):
+        """
+        Requires: parts is a list of (song, port) tuples like for events()
+        Modifies: self.jitter, the objects behind the ports in max/msp
+        Effects:  sends every note at its start time, blocking until the
+                  last note has been sent. Returns stats().
+        """
+        events = self.events(parts)
+        self.jitter = []
+        start = monotonic()
+        for offset, port, pitch, duration in events:
+            deadline = start + offset
+            wait = deadline - monotonic()
+            if wait > self.SPIN:
+                time.sleep(wait - self.SPIN)
+            while monotonic() < deadline:
+                pass
+            self.sender.play(pitch, duration, port)
+            self.jitter.append(monotonic() - deadline)
+        return self.stats()
+
+    def stats(self):
+        """
+        Requires: nothing
+        Modifies: nothing
+        Effects:  returns a dict with the number of notes sent by the last
+                  play() and their mean, median, 99th percentile and
+                  maximum lateness in milliseconds.
+        """
+        jitter = sorted(self.jitter)
+        if not jitter:
+            return {'notes': 0}
+        ms = lambda q: 1000. * jitter[min(int(q * len(jitter)), len(jitter) - 1)]
+        return {'notes': len(jitter),
+                'mean_ms': 1000. * sum(jitter) / len(jitter),
+                'median_ms': ms(.5),
+                'p99_ms': ms(.99),
+                'max_ms': 1000. * jitter[-1]}
+
+def streamToMax(fixed_melody, fixed_bassline, bpm=120, sender=None):
+    """
+    Requires: fixed_melody and fixed_bassline are lists of tuples in form
+              (pitch, duration in 32nd notes), see fixStupidDurations
+    Modifies: the udpreceive objects in max/msp
+    Effects:  plays the melody on MELODY_PORT and the bassline on BASS_PORT
+              in real time with a NoteScheduler, then prints and returns
+              the timing statistics.
+    """
+    scheduler = NoteScheduler(bpm, sender)
+    stats = scheduler.play([(fixed_melody, MELODY_PORT),
+                            (fixed_bassline, BASS_PORT)])
+    print ('Streamed %(notes)d notes, lateness mean %(mean_ms).3f ms, '
+           '99%% %(p99_ms).3f ms, max %(max_ms).3f ms' % stats)
+    return stats
 
 def createPointList(song, songName, part):
     """
     Requires: song is a list of tuples in form (pitch, duration)
               songName and part are strings
     Modifies: nothing
-    Effects:  creates a list of pitches, with each pitch
+    Effects:  creates an array of midi pitches, with each pitch
               in song listed as many times as its new duration
     """
-    point_list = []
-    for note in song:
-        for i in range(note[-1]):
-            point_list.append(MidiNoteToInt(note[0]))
-    return point_list
+    import numpy as np
+    pitches, durations = songToMidi(song)
+    return np.repeat(pitches, durations)
 
 def fixStupidDurations(song):
     """
@@ -333,29 +752,25 @@ def fixStupidDurations(song):
             fixed_song.append((note[0], 48))
     return fixed_song
 
-def createMelody(models, songName, note_list):
+def createMelody(models, note_list):
     """
     Requires: models is a list of trained unigram, bigram, etc models
-              songName is a string
+              note_list is a key signature from KEY_SIGNATURES
     Modifies: nothing
-    Effects:  creates a .wav file containing a randomly generated melody.
-              Returns the melody as a list of tuples.
+    Effects:  returns a randomly generated melody as a list of tuples.
     """
     melody = []
     for i in range(1, 16):
         melody.extend(generateMusicalSentence(models, 8, note_list))
-
-    pysynth.make_wav(melody, fn=songName + "_melody.wav")
     return melody
 
-def createBassLine(models, songName, note_list):
+def createBassLine(models, note_list):
     """
     Requires: models is a list of trained unigram, bigram, etc models
-              songName is a string
+              note_list is a key signature from KEY_SIGNATURES
     Modifies: nothing
-    Effects:  creates a .wav file containing a randomly generated bassline,
-              which is constrained to chord tones 1, 3, 5, and 7 in octave 2.
-              Returns the bassline as a list of tuples.
+    Effects:  returns a randomly generated bassline as a list of tuples,
+              constrained to chord tones 1, 3, 5, and 7 in octave 2.
     """
     bass_line = []
     lowered_bass = []
@@ -366,35 +781,37 @@ def createBassLine(models, songName, note_list):
     #puts all notes in octave 2
     for i in range(len(bass_line)):
         lowered_bass.append((bass_line[i][0][:-1] + '2', 2))
-    pysynth.make_wav(lowered_bass, fn=(songName + "_bassLine.wav"))
     return lowered_bass
 
 def MidiNoteToInt(note):
     """
     Requires: note is a string of form 'c4', 'd#6', 'b0', etc
     Modifies: nothing
-    Effects:  returns the corresponding midi value 0-127
-    """
-    notes = ['c', 'd', 'e', 'f', 'g', 'a', 'b']
-    int_note = 0
-    if (0 <= int(note[-1]) <= 10) and ('a' <= note[0] <= 'g'):
-        #adds 12 for each octave
-        int_note += int(note[-1]) * 12
-        for i in range(len(notes)):
-            #adds 2 for each whole step from c
-            if note[0] == notes[i]:
-                int_note += i * 2
-                #subtracts one due to no note existing between e and f
-                if note[0] == 'f' or note[0] == 'g' or note[0] == 'a' or note[0] == 'b':
-                    int_note -= 1
-        #adjusts for sharps/flats
-        if note[1] == '#':
-            int_note += 1
-        elif note[1] == 'b':
-            int_note -= 1
-    else:
-        return 'Invalid note'
-    return int_note
+    Effects:  returns the corresponding midi value 0-127, looked up in
+              MIDI_NOTES (so 'c4' is 48); raises ValueError for a note
+              that is not in MIDI_NOTES
+    """
+    try:
+        return MIDI_NOTES[note]
+    except KeyError:
+        raise ValueError('invalid note %r' % (note,))
+
+def songToMidi(song):
+    """
+    Requires: song is a list of tuples in form (pitch, duration) with
+              pitches in any spelling of MIDI_NOTES and int durations
+    Modifies: nothing
+    Effects:  returns the midi values and the durations of all notes as two
+              numpy int arrays; raises ValueError for a pitch that is not
+              in MIDI_NOTES, like MidiNoteToInt.
+    """
+    import numpy as np
+    try:
+        pitches = np.array([MIDI_NOTES[note[0]] for note in song], dtype=int)
+    except KeyError as e:
+        raise ValueError('invalid note %r' % (e.args[0],))
+    durations = np.array([note[1] for note in song], dtype=int)
+    return pitches, durations
 
 PROMPT = """
 (1) Generate song lyrics by Funkadelic
@@ -402,30 +819,37 @@ PROMPT = """
 (3) Quit the music generator
 > """
 
-def main():
+def main(live=False):
     """
-    Requires: Nothing
+    Requires: live is a bool, True streams the music to max/msp in real time
+              (see runMusicGenerator)
     Modifies: Nothing
     Effects:  This is your main function, which is done for you. It runs the
               entire generator program for both the reach and the core.
 
               It prompts the user to choose to generate either lyrics or music.
     """
-    print('Starting program and loading data...')
-    lyricModels = trainLyricModels(LYRICSDIRS)
-    musicModels = trainMusicModels(MUSICDIRS)
-    print('Data successfully loaded')
+    # the models are trained the first time they are needed
+    lyricModels = None
+    musicModels = None
 
     print('Welcome to the ' + TEAM + ' music generator!')
     while True:
         try:
             userInput = int(raw_input(PROMPT))
             if userInput == 1:
+                if lyricModels is None:
+                    print('Loading lyrics data...')
+                    lyricModels = trainLyricModels(LYRICSDIRS)
                 runLyricsGenerator(lyricModels)
             elif userInput == 2:
                 songName = raw_input('What would you like to name your song? ')
 
-                runMusicGenerator(musicModels, WAVDIR + songName + '.wav')
+                if musicModels is None:
+                    print('Loading music data...')
+                    musicModels = trainMusicModels(MUSICDIRS)
+                runMusicGenerator(musicModels, WAVDIR + songName + '.wav',
+                                  live=live)
             
             elif userInput == 3:
                 print('Thank you for using the ' + TEAM + ' music generator!')
@@ -435,5 +859,58 @@ def main():
         except ValueError:
             print("Please enter a number")
 
+def writeMetrics(jsonFile=None, prometheusFile=None, **extra):
+    """
+    Requires: jsonFile and prometheusFile are None or file names
+    Modifies: the files
+    Effects:  writes the timings and counters collected by metrics
+              as a JSON summary (with the items of extra added) and/or as a
+              Prometheus text file.
+    """
+    if jsonFile:
+        metrics.writeJson(jsonFile, **extra)
+    if prometheusFile:
+        metrics.writePrometheus(prometheusFile)
+
+def checkStartup(budget=STARTUP_BUDGET):
+    """
+    Requires: budget is a number of seconds
+    Modifies: nothing
+    Effects:  imports generate in a new python process and returns True if
+              that took at most budget seconds and loaded none of the
+              HEAVY_MODULES. Prints the result.
+    """
+    code = ('import time; start = time.time(); import generate; '
+            'print time.time() - start; import sys; '
+            'print " ".join(m for m in %r if m in sys.modules)'
+            % HEAVY_MODULES)
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=here)
+    seconds, heavy = (output.split('\n') + [''])[:2]
+    seconds = float(seconds)
+    ok = seconds <= budget and not heavy.strip()
+    print('import generate: %.3f s (budget %.3f s)%s: %s' % (
+        seconds, budget, ', loaded ' + heavy if heavy.strip() else '',
+        'ok' if ok else 'too slow'))
+    return ok
+
 if __name__ == '__main__':
-    main()
+    import argparse
+    parser = argparse.ArgumentParser(description='The ' + TEAM +
+                                     ' music generator.')
+    parser.add_argument('--check-startup', action='store_true',
+                        help='check the import time of generate and exit')
+    parser.add_argument('--live', action='store_true',
+                        help='stream the notes to max/msp while they play')
+    parser.add_argument('--metrics', metavar='JSON',
+                        help='write stage timings and counters to JSON')
+    parser.add_argument('--prometheus', metavar='FILE',
+                        help='write them to FILE in the Prometheus format')
+    options = parser.parse_args()
+    if options.check_startup:
+        sys.exit(not checkStartup())
+    metrics.enable(bool(options.metrics or options.prometheus))
+    try:
+        main(options.live)
+    finally:
+        writeMetrics(options.metrics, options.prometheus)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+"""
+Stand-in for the udpreceive side of MusicGen.maxpat, for machines without
+Max/MSP. It listens on the melody, bassline and chord ports and handles
+the same messages as the patch:
+
+    clear                  empties the text (or coll) object of the port
+    batch a1 b1 a2 b2 ...  appends the pairs (see generate.MaxSender)
+    a b                    appends one pair (older senders)
+    play pitch duration    a note streamed in real time (NoteScheduler)
+
+On the melody and bassline ports a pair is (midi pitch, 32nd notes), on
+the chord port (midi pitch, 0 = minor / 1 = major).
+
+    python maxstub.py --render out.wav     # then run generate.py
+
+listens until no datagram has arrived for --idle seconds after the first
+one, prints what it received and renders the melody and bassline with a
+pysynth engine.
+
+    python maxstub.py --bench
+
+sends random songs to itself, once per note as the old sendToMax did and
+once in batches, and reports datagrams, packet loss, ordering and
+throughput of both.
+"""
+import sys
+sys.dont_write_bytecode = True # Suppress .pyc files
+import random
+import select
+import socket
+import argparse
+import threading
+import generate
+from generate import MELODY_PORT, BASS_PORT, CHORD_PORT, MAX_HOST
+from models.musicInfo import MIDI_NAMES
+
+class MaxStandIn(object):
+    """
+    Receives and stores what generate.py sends to Max/MSP. Per port it
+    keeps the received pairs in self.text (a dict for the chord port,
+    like coll), the 'play' notes with their arrival times in self.played,
+    and counts of datagrams, bytes and unknown messages.
+    """
+
+    def __init__(self, host=MAX_HOST,
+                 ports=(MELODY_PORT, BASS_PORT, CHORD_PORT),
+                 collPort=CHORD_PORT):
+        """
+        Requires: ports are free UDP ports on host
+        Modifies: self
+        Effects:  binds one socket per port.
+        """
+        self.collPort = collPort
+        self.socks = {}
+        for port in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind((host, port))
+            self.socks[port] = sock
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.reset()
+
+    def reset(self):
+        """
+        Requires: nothing
+        Modifies: self
+        Effects:  forgets everything received so far.
+        """
+        with self.lock:
+            self.text = dict((port, {} if port == self.collPort else [])
+                             for port in self.socks)
+            self.played = dict((port, []) for port in self.socks)
+            self.datagrams = dict((port, 0) for port in self.socks)
+            self.bytes = dict((port, 0) for port in self.socks)
+            self.unknown = dict((port, 0) for port in self.socks)
+            self.first = self.last = None
+
+    def handle(self, port, data, when):
+        """
+        Requires: data is a datagram received on port at time when
+        Modifies: self
+        Effects:  applies the message like the patch would.
+        """
+        words = data.split()
+        with self.lock:
+            self.datagrams[port] += 1
+            self.bytes[port] += len(data)
+            if self.first is None:
+                self.first = when
+            self.last = when
+            try:
+                if words == ['clear']:
+                    self.text[port] = {} if port == self.collPort else []
+                    return
+                if words and words[0] == 'play':
+                    self.played[port].append((when, int(words[1]),
+                                              int(words[2])))
+                    return
+                if words and words[0] == 'batch':
+                    words = words[1:]
+                values = map(int, words)
+                if not values or len(values) % 2:
+                    raise ValueError(data)
+            except (ValueError, IndexError):
+                self.unknown[port] += 1
+                return
+            pairs = zip(values[::2], values[1::2])
+            if port == self.collPort:
+                self.text[port].update(pairs)
+            else:
+                self.text[port].extend(pairs)
+
+    def serve(self, idle=None):
+        """
+        Requires: idle is None or a number of seconds
+        Modifies: self
+        Effects:  receives datagrams until stop() is called or, with idle,
+                  until nothing has arrived for idle seconds after the
+                  first datagram.
+        """
+        self.running = True
+        socks = dict((sock, port) for port, sock in self.socks.items())
+        while self.running:
+            readable = select.select(socks.keys(), [], [], .05)[0]
+            now = generate.monotonic()
+            for sock in readable:
+                self.handle(socks[sock], sock.recv(65536), now)
+            if idle is not None and self.last is not None and \
+               now - self.last > idle:
+                break
+
+    def start(self):
+        """
+        Requires: nothing
+        Modifies: self
+        Effects:  runs serve() in a background thread.
+        """
+        self.thread = threading.Thread(target=self.serve)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def close(self):
+        self.stop()
+        for sock in self.socks.values():
+            sock.close()
+
+    def song(self, port):
+        """
+        Requires: port is the melody or bassline port
+        Modifies: nothing
+        Effects:  returns the received notes as a pysynth song; the played
+                  notes if some arrived, otherwise the stored pairs.
+        """
+        notes = [(pitch, duration) for when, pitch, duration
+                 in self.played[port]] or self.text[port]
+        return [(MIDI_NAMES[pitch], 32. / duration)
+                for pitch, duration in notes]
+
+    def render(self, fn, engine, preview=False):
+        """
+        Requires: engine is a pysynth engine module
+        Modifies: the file fn
+        Effects:  renders the received melody and bassline like
+                  generate.renderSong does.
+        """
+        generate.renderSong(self.song(MELODY_PORT), self.song(BASS_PORT), fn,
+                            engine, preview)
+
+    def report(self):
+        """
+        Requires: nothing
+        Modifies: nothing
+        Effects:  returns a text summary of what has been received.
+        """
+        lines = []
+        for port in sorted(self.socks):
+            stored = self.text[port]
+            lines.append('port %d: %d datagrams, %d bytes, %d stored, '
+                         '%d played, %d unknown' % (
+                             port, self.datagrams[port], self.bytes[port],
+                             len(stored), len(self.played[port]),
+                             self.unknown[port]))
+        if self.first is not None and self.last > self.first:
+            seconds = self.last - self.first
+            lines.append('%.3f s from first to last datagram, %.0f '
+                         'datagrams/s' % (seconds,
+                                          sum(self.datagrams.values())
+                                          / seconds))
+        return '\n'.join(lines)
+
+def sendPerNote(sock, pairs, port, host=MAX_HOST):
+    """
+    Requires: pairs is a list of pairs of ints
+    Modifies: the receiver on port
+    Effects:  sends pairs one datagram each, the way sendToMax did before
+              MaxSender.
+    """
+    sock.sendto('clear', (host, port))
+    for a, b in pairs:
+        sock.sendto('%s %s \n' % (a, b), (host, port))
+
+def compare(sent, received):
+    """
+    Requires: sent and received are lists of pairs
+    Modifies: nothing
+    Effects:  returns (lost, inOrder): how many sent pairs did not arrive
+              and whether the ones that did arrived in the order sent.
+    """
+    lost = len(sent) - len(received)
+    i = 0
+    for pair in received:
+        while i < len(sent) and sent[i] != pair:
+            i += 1
+        if i == len(sent):
+            return lost, False
+        i += 1
+    return lost, True
+
+def benchmark(stub, songs, notes, seed=0):
+    """
+    Requires: stub is a started MaxStandIn
+    Modifies: stub
+    Effects:  sends songs random songs of the given number of notes to the
+              melody port, per note and batched, and prints datagrams,
+              lost and reordered notes and throughput of both. The time
+              of a song is from the start of sending to the arrival of
+              its last datagram.
+    """
+    random.seed(seed)
+    durations = [2, 3, 4, 6, 8, 12, 16, 24, 32, 48]
+    tests = [[(random.randint(24, 84), random.choice(durations))
+              for i in range(notes)] for j in range(songs)]
+    legacy = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender = generate.MaxSender()
+    for name, send, expected in (
+            ('per note', lambda pairs: sendPerNote(legacy, pairs, MELODY_PORT),
+             lambda pairs: len(pairs) + 1),
+            ('batched', lambda pairs: sender.send(pairs, MELODY_PORT),
+             lambda pairs: len(sender.pack(pairs)) + 1)):
+        datagrams = lost = reordered = 0
+        seconds = 0.
+        for pairs in tests:
+            stub.reset()
+            start = generate.monotonic()
+            send(pairs)
+            # wait for the last datagram, or give up on the lost ones
+            while stub.datagrams[MELODY_PORT] < expected(pairs) and \
+                  generate.monotonic() - start < .5:
+                generate.time.sleep(.001)
+            with stub.lock:
+                datagrams += stub.datagrams[MELODY_PORT]
+                missing, inOrder = compare(pairs, stub.text[MELODY_PORT])
+                if stub.last is not None:
+                    seconds += stub.last - start
+            lost += missing
+            reordered += not inOrder
+        print ('%-8s: %d notes in %d datagrams, %d lost, %d songs out of '
+               'order, %.1f ms per song, %.0f notes/s' % (
+                   name, songs * notes, datagrams, lost, reordered,
+                   1000. * seconds / songs, songs * notes / seconds))
+    legacy.close()
+    sender.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Stand-in for the Max/MSP '
+                                     'patch (MusicGen.maxpat).')
+    parser.add_argument('--idle', type=float, default=2.,
+                        help='stop after this many seconds without data '
+                        '(default 2)')
+    parser.add_argument('--render', metavar='WAV',
+                        help='render the received melody and bassline')
+    parser.add_argument('--engine', choices=sorted(generate.ENGINES),
+                        default='a',
+                        help='pysynth engine for --render (default a)')
+    parser.add_argument('--preview', action='store_true',
+                        help='render a quick low sample rate preview')
+    parser.add_argument('--bench', action='store_true',
+                        help='benchmark per-note against batched sending')
+    parser.add_argument('--songs', type=int, default=100,
+                        help='songs sent by --bench (default 100)')
+    parser.add_argument('--notes', type=int, default=120,
+                        help='notes per song for --bench (default 120)')
+    options = parser.parse_args(argv)
+
+    stub = MaxStandIn()
+    try:
+        if options.bench:
+            stub.start()
+            benchmark(stub, options.songs, options.notes)
+            return
+        print 'Listening on ports %s...' % ', '.join(map(str, sorted(stub.socks)))
+        stub.serve(options.idle)
+        print stub.report()
+        print 'Chords:', sorted(stub.text[CHORD_PORT].items())
+        if options.render:
+            stub.render(options.render, generate.loadEngine(options.engine),
+                        options.preview)
+    finally:
+        stub.close()
+
+if __name__ == '__main__':
+    main()
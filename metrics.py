@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+"""
+Lightweight stage timers and counters for the music generator.
+
+Instrumentation is off until enable() is called; until then timer() and
+count() return at once, so the instrumented code pays one test of a
+module flag per call.
+
+    metrics.enable()
+    with metrics.timer('trainModel'):    # or @metrics.timed('loadMusic')
+        ...
+    metrics.count('tokens_generated')
+    metrics.writeJson('run.json')
+    metrics.writePrometheus('run.prom')
+
+A timer records how often a stage ran, its total and its longest time in
+seconds on a monotonic clock. generate.py also installs this module as
+the recorder of pysynth.hooks, so the synth's own stages (make_wav,
+render, mix_files) and counters (note and render cache hits, samples
+rendered) end up in the same summary.
+"""
+import re
+import json
+import time
+import ctypes
+import threading
+import functools
+
+enabled = False
+_lock = threading.Lock()
+_counters = {}
+_timers = {} # name -> [count, total seconds, maximum seconds]
+
+def _monotonicClock():
+    """
+    Requires: nothing
+    Modifies: nothing
+    Effects:  returns a function returning seconds of a clock that never
+              jumps: time.monotonic where it exists, CLOCK_MONOTONIC through
+              librt on Linux, else time.time.
+    """
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+    try:
+        clock_gettime = ctypes.CDLL('librt.so.1', use_errno=True).clock_gettime
+    except (OSError, AttributeError):
+        return time.time
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+    CLOCK_MONOTONIC = 1
+
+    def monotonic():
+        t = timespec()
+        if clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)) != 0:
+            raise OSError(ctypes.get_errno(), 'clock_gettime failed')
+        return t.tv_sec + t.tv_nsec * 1e-9
+    return monotonic
+
+monotonic = _monotonicClock()
+
+def enable(on=True):
+    """
+    Requires: on is a bool
+    Modifies: enabled
+    Effects:  turns the recording of timers and counters on or off.
+    """
+    global enabled
+    enabled = on
+
+def reset():
+    """
+    Requires: nothing
+    Modifies: the recorded timers and counters
+    Effects:  forgets everything recorded so far.
+    """
+    with _lock:
+        _counters.clear()
+        _timers.clear()
+
+def count(name, n=1):
+    """
+    Requires: name is a str, n is a number
+    Modifies: the counter name
+    Effects:  adds n to the counter name when recording is enabled.
+    """
+    if enabled:
+        with _lock:
+            _counters[name] = _counters.get(name, 0) + n
+
+def addTime(name, seconds):
+    """
+    Requires: name is a str, seconds is a number
+    Modifies: the timer name
+    Effects:  records a run of the stage name that took seconds.
+    """
+    with _lock:
+        t = _timers.setdefault(name, [0, 0., 0.])
+        t[0] += 1
+        t[1] += seconds
+        t[2] = max(t[2], seconds)
+
+class _Timer(object):
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = monotonic()
+
+    def __exit__(self, *exc):
+        addTime(self.name, monotonic() - self.start)
+
+class _NullTimer(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_nullTimer = _NullTimer()
+
+def timer(name):
+    """
+    Requires: name is a str
+    Modifies: nothing
+    Effects:  returns a context manager timing its block as the stage name
+              (one doing nothing when recording is disabled).
+    """
+    if enabled:
+        return _Timer(name)
+    return _nullTimer
+
+def timed(name):
+    """
+    Requires: name is a str
+    Modifies: nothing
+    Effects:  returns a decorator timing every call of a function as the
+              stage name.
+    """
+    def decorate(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kw):
+            if not enabled:
+                return f(*args, **kw)
+            with _Timer(name):
+                return f(*args, **kw)
+        return wrapper
+    return decorate
+
+def snapshot():
+    """
+    Requires: nothing
+    Modifies: nothing
+    Effects:  returns the counters and timers as a dict, the JSON summary:
+              {'counters': {name: n},
+               'timers': {name: {'count', 'seconds', 'max_seconds'}}}
+    """
+    with _lock:
+        return {'counters': dict(_counters),
+                'timers': dict((name, {'count': t[0], 'seconds': t[1],
+                                       'max_seconds': t[2]})
+                               for name, t in _timers.items())}
+
+def merge(snap):
+    """
+    Requires: snap is a snapshot(), e.g. of a worker process
+    Modifies: the recorded timers and counters
+    Effects:  adds the values of snap to the recorded ones.
+    """
+    with _lock:
+        for name, n in snap['counters'].items():
+            _counters[name] = _counters.get(name, 0) + n
+        for name, s in snap['timers'].items():
+            t = _timers.setdefault(name, [0, 0., 0.])
+            t[0] += s['count']
+            t[1] += s['seconds']
+            t[2] = max(t[2], s['max_seconds'])
+
+def writeJson(fn, **extra):
+    """
+    Requires: fn is a file name
+    Modifies: the file fn
+    Effects:  writes snapshot() with the items of extra added as JSON.
+    """
+    summary = snapshot()
+    summary.update(extra)
+    with open(fn, 'w') as f:
+        json.dump(summary, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def _metricName(name):
+    return re.sub('[^a-zA-Z0-9_]', '_', name)
+
+def prometheus(prefix='musicgen_'):
+    """
+    Requires: prefix is a str
+    Modifies: nothing
+    Effects:  returns the counters (as <prefix><name>_total) and timers (as
+              the summary <prefix>stage_seconds with a stage label, and its
+              maximum as a gauge) in the Prometheus text format.
+    """
+    snap = snapshot()
+    lines = []
+    for name, n in sorted(snap['counters'].items()):
+        metric = prefix + _metricName(name) + '_total'
+        lines.append('# TYPE %s counter' % metric)
+        lines.append('%s %s' % (metric, n))
+    if snap['timers']:
+        stage = prefix + 'stage_seconds'
+        lines.append('# TYPE %s summary' % stage)
+        for name, t in sorted(snap['timers'].items()):
+            lines.append('%s_sum{stage="%s"} %r' % (stage, name, t['seconds']))
+            lines.append('%s_count{stage="%s"} %d' % (stage, name, t['count']))
+        lines.append('# TYPE %s_max gauge' % stage)
+        for name, t in sorted(snap['timers'].items()):
+            lines.append('%s_max{stage="%s"} %r' % (stage, name,
+                                                   t['max_seconds']))
+    return ''.join(line + '\n' for line in lines)
+
+def writePrometheus(fn, prefix='musicgen_'):
+    """
+    Requires: fn is a file name, prefix is a str
+    Modifies: the file fn
+    Effects:  writes prometheus(prefix) into the text file fn.
+    """
+    with open(fn, 'w') as f:
+        f.write(prometheus(prefix))
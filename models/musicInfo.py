@@ -27,3 +27,21 @@ KEY_SIGNATURES = {
 
 # List of PySynth note durations
 NOTE_DURATIONS = [1, 2, -2, 4, -4, 8, -8, 16]
+
+# Semitones above c of the note letters
+NOTE_STEPS = {'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7, 'a': 9, 'b': 11}
+
+# MIDI numbers of note names (c4 = 48) in every spelling pysynth accepts:
+# sharps and flats, octaves 0 to 9 or no octave (octave 4, like pysynth),
+# and an optional asterisk for a louder note
+MIDI_NOTES = dict(('%s%s%s%s' % (letter, accidental, octave, loud),
+                   12 * (4 if octave == '' else octave) + step + shift)
+                  for letter, step in NOTE_STEPS.items()
+                  for accidental, shift in (('', 0), ('#', 1), ('b', -1))
+                  for octave in [''] + range(10)
+                  for loud in ('', '*'))
+
+# Note names of MIDI numbers 0 to 119, the inverse of MIDI_NOTES (sharps)
+MIDI_NAMES = list('%s%d' % (name, midi // 12) for midi, name in
+                  enumerate(['c', 'c#', 'd', 'd#', 'e', 'f',
+                             'f#', 'g', 'g#', 'a', 'a#', 'b'] * 10))
@@ -2,6 +2,7 @@ import random
 import sys
 import json
 from musicInfo import *
+import metrics
 
 class NGramModel(object):
 
@@ -123,6 +124,7 @@ class NGramModel(object):
                   For more information on how to put all these functions
                   together, see the spec.
         """
+        metrics.count('tokens_generated')
         return self.weightedChoice(self.getCandidateDictionary(sentence))
 
     def getNextNote(self, musicalSentence, possiblePitches):
@@ -137,6 +139,7 @@ class NGramModel(object):
                   For details on how to do this and how this will differ
                   from getNextToken, see the spec.
         """
+        metrics.count('tokens_generated')
         #makes dict consisting of possible notes
         allCandidates = self.getCandidateDictionary(musicalSentence)
         #makes new dict consisting of possible notes that are also in the key signature
@@ -147,6 +150,8 @@ class NGramModel(object):
         if constrainedCandidates != {}:
             return self.weightedChoice(constrainedCandidates)
         else:
+            #no known note fits the key, picks a random one
+            metrics.count('random_notes')
             return (random.choice(possiblePitches) + '4', random.choice(NOTE_DURATIONS))
 
 ###############################################################################
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+"""
+Reentrant song renderer shared by the NumPy PySynth engines
+(pysynth_b, pysynth_e and pysynth_s).
+
+An Engine holds the render parameters (bpm, transpose, ...) and a note
+cache, everything else lives in local variables of render(). One engine
+can therefore render several songs at once from different threads, and
+engines can share a NoteCache to reuse notes synthesized by each other.
+
+Subclasses implement note(), which returns the samples of a single note;
+render() schedules the notes of the song's Timeline (see timeline.py)
+and adds them into the song buffer. With
+threads > 1 the notes are synthesized in a thread pool (NumPy releases
+the GIL in its ufuncs) and still added in song order, so the output does
+not depend on the number of threads.
+
+Incremental(engine) renders a song and afterwards edited versions of
+it; for each edit only the notes that were removed or added are
+synthesized.
+
+With processes > 1 the song is split into runs of consecutive notes that
+are rendered in worker processes, including the ringing tails of their
+notes, and added back at their sample positions. This also parallelizes
+pysynth_s, whose synthesis is mostly Python code.
+
+  e = pysynth_b.Engine(bpm = 130, transpose = 1)
+  e.make_wav(song4_rh, fn = "rh.wav")
+"""
+
+import threading, wave
+from itertools import imap, izip
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
+import numpy as np
+from math import pi
+from tables import keyhz, RATE, PREVIEW_RATE, PREVIEW_RING, PREVIEW_TAIL
+from timeline import Timeline, compile_song
+import hooks
+
+class NoteCache(object):
+	"Thread-safe store of synthesized notes, shared between renders."
+
+	def __init__(self):
+		self.notes = {}
+		self.lock = threading.Lock()
+
+	def get(self, key):
+		with self.lock:
+			samples = self.notes.get(key)
+		hooks.count('note_cache_misses' if samples is None else 'note_cache_hits')
+		return samples
+
+	def put(self, key, samples):
+		"Store samples under key (read-only) and return the stored array."
+		samples.flags.writeable = False
+		with self.lock:
+			return self.notes.setdefault(key, samples)
+
+	def clear(self):
+		with self.lock:
+			self.notes.clear()
+
+	def __len__(self):
+		return len(self.notes)
+
+class Engine(object):
+	"Base class of the NumPy engines; see the module docstring."
+
+	ring = 12.	# maximum length of a note in seconds (None: no limit)
+	extra = 10.	# seconds of buffer allocated beyond the song length
+	parallel = True	# note() may run in several threads at once
+
+	def __init__(self, bpm = 120, transpose = 0, boost = 1.1, repeat = 0,
+	             silent = False, precision = np.float32, rate = RATE,
+	             tail = 2., preview = False, cache = None, threads = 1,
+	             processes = 1):
+		if preview:
+			rate, tail = PREVIEW_RATE, PREVIEW_TAIL
+			self.ring = min(self.ring or PREVIEW_RING, PREVIEW_RING)
+		self.bpm = bpm
+		self.transpose = transpose
+		self.boost = boost
+		self.repeat = repeat
+		self.silent = silent
+		self.precision = precision
+		self.rate = rate
+		self.tail = tail
+		self.preview = preview
+		if cache is None:
+			cache = NoteCache()
+		self.cache = cache
+		self.threads = threads or cpu_count()	# 0 or None: one per CPU
+		self.processes = processes or cpu_count()
+
+	def waves2(self, hz, l):
+		"Period in samples and number of periods of a tone hz long l samples."
+		a = float(self.rate) / hz
+		b = float(l) / self.rate * hz
+		return [a, round(b)]
+
+	def phase(self, n, period):
+		"2*pi*x/period for x < n, in render precision."
+		# reduced to one period in float64 first, so that float32 keeps
+		# the phase accurate for long notes
+		return (2. * pi / period * (np.arange(n) % period)).astype(self.precision)
+
+	def note(self, a, b, vol, kn, cacheable):
+		"""Return the samples of one note of frequency a, b samples long.
+
+		kn is the piano key number; cacheable is True if the note occurs
+		more than once and may be cached."""
+		raise NotImplementedError
+
+	def prepare(self, args):
+		"""Hook called with the note() arguments of every note, in song
+		order, before any note is synthesized; returns the arguments."""
+		return args
+
+	def compile(self, song):
+		"Compile a song into a Timeline with this engine's settings."
+		return compile_song(song, self.bpm, self.rate, self.repeat, self.boost)
+
+	def schedule(self, song):
+		"""Return (jobs, song length in samples, buffer length), where jobs
+		holds (index, start sample, note() arguments) per note. song is a
+		list of (note, value) tuples or a Timeline from compile()."""
+		if not isinstance(song, Timeline):
+			song = self.compile(song)
+		elif song.rate != self.rate:
+			raise ValueError("timeline rate %u does not match engine rate %u" % (song.rate, self.rate))
+		ev = song.events
+		# notes that occur more than once are worth caching
+		keys, counts = np.unique(ev['key'], return_counts = True)
+		repeated = set(keys[counts > 1].tolist())
+
+		jobs = []
+		fac = 2**self.transpose
+		for n, (start, length, kn, vol) in enumerate(zip(ev['start'].tolist(),
+		    ev['length'].tolist(), ev['key'].tolist(), ev['vol'].tolist())):
+			jobs.append((n, start, self.prepare(
+			  (keyhz[kn] * fac, length, vol, kn, kn in repeated))))
+		return jobs, song.end, int(song.end + self.extra * self.rate)
+
+	def _note(self, job):
+		return self.note(*job[2])
+
+	def mix(self, jobs, data, offset = 0, progress = None, sign = 1.):
+		"""Synthesize the notes in jobs and add them into data[pos-offset:]
+		(subtract them with sign = -1.). Returns data, grown if needed."""
+		pool = None
+		if self.threads > 1 and self.parallel:
+			pool = ThreadPool(self.threads)
+			notes = pool.imap(self._note, jobs)
+		else:
+			notes = imap(self._note, jobs)
+		try:
+			for (nn, pos, args), new in izip(jobs, notes):
+				if progress and not nn % 4:
+					print "[%u/%u]\t" % (nn+1, progress)
+				pos -= offset
+				if pos + len(new) > len(data):
+					data = np.concatenate((data, np.zeros(pos + len(new) - len(data), data.dtype)))
+				if sign < 0:
+					data[pos:pos+len(new)] -= new
+				else:
+					data[pos:pos+len(new)] += new
+		finally:
+			if pool is not None:
+				pool.terminate()
+		return data
+
+	def segments(self, jobs):
+		"Split jobs into contiguous runs, one per worker process."
+		n = min(self.processes, len(jobs))
+		return [jobs[len(jobs)*k//n:len(jobs)*(k+1)//n] for k in range(n)]
+
+	@hooks.timed('render')
+	def render(self, song):
+		"Render a song or Timeline and return it as a normalized float array."
+		jobs, ex_pos, size = self.schedule(song)
+		data = np.zeros(size, self.precision)
+
+		if self.processes > 1 and len(jobs) > 1:
+			# Each worker renders a run of consecutive notes, including
+			# their full tails, into a buffer starting at the run's first
+			# note; the buffers are added at their absolute positions.
+			pool = Pool(self.processes)
+			try:
+				segs = self.segments(jobs)
+				for k, (start, part) in enumerate(pool.imap(_render_segment,
+				    [(self, seg) for seg in segs])):
+					if not self.silent:
+						print "[%u/%u]\t" % (k+1, len(segs))
+					if start + len(part) > len(data):
+						# a low note rings past the buffer, like in mix()
+						data = np.concatenate((data, np.zeros(start + len(part) - len(data), data.dtype)))
+					data[start:start+len(part)] += part
+				pool.close()
+				pool.join()
+			finally:
+				pool.terminate()
+		else:
+			data = self.mix(jobs, data, progress = not self.silent and len(jobs))
+
+		data = data / (data.max() * 2.)
+		data = data[:int(self.tail * self.rate + ex_pos+.5)]
+		hooks.count('notes_rendered', len(jobs))
+		hooks.count('samples_rendered', len(data))
+		return data
+
+	def __getstate__(self):
+		# Engines are pickled for worker processes: the workers keep
+		# their own note cache per engine class and synthesize serially.
+		state = self.__dict__.copy()
+		state['cache'] = None
+		state['threads'] = state['processes'] = 1
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.cache = _worker_caches.setdefault(type(self), NoteCache())
+
+	@hooks.timed('make_wav')
+	def make_wav(self, song, fn = "out.wav"):
+		"Render song into the WAV file fn (a file name or file object)."
+		self.write(self.render(song), fn)
+
+	def write(self, data, fn):
+		"Write a rendered song into the WAV file fn."
+		if not self.silent:
+			print "Writing to file", fn
+		f = wave.open(fn, 'w')
+		f.setnchannels(1)
+		f.setsampwidth(2)
+		f.setframerate(self.rate)
+		f.setcomptype('NONE','Not Compressed')
+		data2 = np.zeros(len(data), np.short)
+		data2[:] = 32000. * data
+		f.writeframes(data2.tostring())
+		f.close()
+		if not self.silent:
+			print
+
+def resample(x, f, n):
+	"""Return n samples of x read at 0, f, 2f, ..., interpolated with a
+	cubic (Catmull-Rom) spline. f <= 1 lowers the pitch by a factor f."""
+	pos = np.arange(n) * f
+	i = pos.astype(int)
+	t = (pos - i).astype(x.dtype)
+	m = len(x) - 1
+	p0 = x[np.maximum(i - 1, 0)]
+	p1 = x[i]
+	p2 = x[np.minimum(i + 1, m)]
+	p3 = x[np.minimum(i + 2, m)]
+	return p1 + .5 * t * (p2 - p0 + t * (2.*p0 - 5.*p1 + 4.*p2 - p3
+	                                   + t * (3. * (p1 - p2) + p3 - p0)))
+
+class Incremental(object):
+	"""Render edited versions of a song by patching the previous render.
+
+	The unnormalized song buffer is kept between calls. When the song
+	changes, the notes that are gone are synthesized again and subtracted
+	(including their tails), the new ones are added, and the buffer is
+	normalized again. Notes are matched by start sample and note()
+	arguments, so an edit that shifts the rest of the song in time
+	changes all following notes. The result equals a full render up to
+	float rounding.
+
+	  inc = Incremental(pysynth_b.Engine())
+	  inc.make_wav(song, "a.wav")
+	  song[10] = ('e5', 8)
+	  inc.make_wav(song, "a.wav")	# synthesizes 2 notes
+	"""
+
+	def __init__(self, engine):
+		self.engine = engine
+		self.jobs = {}		# rendered notes, by identity
+		self.data = np.zeros(0)	# float64 to keep rounding out of the patches
+		self.span = None	# first and last start sample of the notes changed last
+
+	def ident(self, job):
+		# start sample and frequency, length, volume, key number
+		return (job[1],) + job[2][:4]
+
+	def render(self, song):
+		"Render song, synthesizing only the notes changed since the last call."
+		e = self.engine
+		jobs, end, size = e.schedule(song)
+		old = self.jobs
+		self.jobs = {}
+		added = []
+		for job in jobs:
+			k = self.ident(job)
+			if old.get(k):
+				# unchanged: keep the old job, e.g. its pysynth_s noise
+				self.jobs.setdefault(k, []).append(old[k].pop())
+			else:
+				self.jobs.setdefault(k, []).append(job)
+				added.append(job)
+		removed = [j for js in old.values() for j in js]
+
+		if len(self.data) < size:
+			self.data = np.concatenate((self.data, np.zeros(size - len(self.data))))
+		self.data = e.mix(removed, self.data, sign = -1.)
+		self.data = e.mix(added, self.data)
+		changed = [j[1] for j in removed + added]
+		self.span = (min(changed), max(changed)) if changed else None
+		if not e.silent:
+			print "%u notes removed, %u added" % (len(removed), len(added))
+
+		data = (self.data / (self.data.max() * 2.)).astype(e.precision)
+		return data[:int(e.tail * e.rate + end+.5)]
+
+	def make_wav(self, song, fn = "out.wav"):
+		self.engine.write(self.render(song), fn)
+
+# Note caches of a worker process, by engine class
+_worker_caches = {}
+
+def _render_segment(task):
+	"Worker process: render a run of notes, return (start sample, samples)."
+	engine, jobs = task
+	start = jobs[0][1]
+	data = np.zeros(jobs[-1][1] - start + int(engine.ring * engine.rate if engine.ring
+	                                          else engine.extra * engine.rate), engine.precision)
+	data = engine.mix(jobs, data, start)
+	nz = np.flatnonzero(data)
+	return start, data[:nz[-1]+1 if len(nz) else 0]
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+
+"""
+Instrumentation hooks of PySynth.
+
+The engines report the time spent in their stages (make_wav, render,
+render_tracks, mix, mix_files) and counters (notes and samples rendered,
+note cache and render cache hits and misses) through this module. It
+does nothing until a program passes in a recorder:
+
+  hooks.install(recorder)
+
+A recorder is an object or module with an 'enabled' flag and the
+functions count(name, n), timer(name) (a context manager), reset(),
+snapshot() and merge(snapshot); snapshot() must return something that
+can be pickled. The counts and times of worker processes are included
+where the parent collects them (multitrack.render_tracks does, Engine
+processes do not). install(None) removes the recorder again.
+"""
+
+import functools
+
+recorder = None
+
+def install(r):
+	"Send the timings and counts to r (None to drop them)."
+	global recorder
+	recorder = r
+
+def active():
+	"Return True if a recorder is installed and enabled."
+	return recorder is not None and recorder.enabled
+
+def count(name, n = 1):
+	"Add n to the counter name."
+	if recorder is not None:
+		recorder.count(name, n)
+
+class _NullTimer(object):
+	def __enter__(self):
+		pass
+
+	def __exit__(self, *exc):
+		pass
+
+_null_timer = _NullTimer()
+
+def timer(name):
+	"Context manager timing a block as the stage name."
+	if recorder is not None:
+		return recorder.timer(name)
+	return _null_timer
+
+def timed(name):
+	"Decorator timing every call of a function as the stage name."
+	def decorate(f):
+		@functools.wraps(f)
+		def wrapper(*args, **kw):
+			with timer(name):
+				return f(*args, **kw)
+		return wrapper
+	return decorate
+
+def reset():
+	"Forget what the recorder has recorded (in a forked worker process)."
+	if recorder is not None:
+		recorder.reset()
+
+def snapshot():
+	"Return the recorder's snapshot(), or None without a recorder."
+	if recorder is not None:
+		return recorder.snapshot()
+
+def merge(snap):
+	"Add the snapshot of a worker process to the recorder."
+	if recorder is not None and snap is not None:
+		recorder.merge(snap)
@@ -7,13 +7,12 @@ Pranav Ravichandran (me@onloop.net)
 
 import play_wav
 import pysynth, pysynth_b, pysynth_s
-import wave
+from targets import render_bytes
 import sys
 import os
-import string
 
 #Type 'help' to access.
-helpContent = "------------------------------\nPySynth musical note interpreter.\nUsage: <Duration><Note> <Duration2><Note2> .... <DurationN><NoteN>\nOptional arguments:\n\t--bpm=Beats per minute [Default:120]\n\t--repeat=Number of bars [Default:1]\n\t--sound=Instrument [a = Flute/Organ, b = piano, s = plucked string, Default = a]\n\t--save=filename (Filename to save the file to. Appends .wav to filename)\nSamples:\n8g 8g 8g 2eb 8r 8f 8f 8f 1d --sound=a\n4e4 4e4 4f4 4g4 4g4 4f4 4e4 4d4 4c4 4c4 4d4 4e4 4e4 4d4 2d4 4e4 4e4 4f4 4g4 4g4 4f4 4e4 4d4 4c4 4c4 4d4 4e4 4d4 4c4 2c4 --bpm=200 --repeat=1 --sound=s --save=Ode_to_Joy\nCommands: 'exit' and 'help'\n------------------------------"
+helpContent = "------------------------------\nPySynth musical note interpreter.\nUsage: <Duration><Note> <Duration2><Note2> .... <DurationN><NoteN>\nOptional arguments:\n\t--bpm=Beats per minute [Default:120]\n\t--repeat=Number of bars [Default:1]\n\t--sound=Instrument [a = Flute/Organ, b = piano, s = plucked string, Default = a]\n\t--save=filename (Filename to save the file to. Appends .wav to filename)\n\t--preview (Quick render at a lower sample rate)\nSamples:\n8g 8g 8g 2eb 8r 8f 8f 8f 1d --sound=a\n4e4 4e4 4f4 4g4 4g4 4f4 4e4 4d4 4c4 4c4 4d4 4e4 4e4 4d4 2d4 4e4 4e4 4f4 4g4 4g4 4f4 4e4 4d4 4c4 4c4 4d4 4e4 4d4 4c4 2c4 --bpm=200 --repeat=1 --sound=s --save=Ode_to_Joy\nCommands: 'exit' and 'help'\n------------------------------"
 
 usageHelp = "Notes are 'a' through 'g' of course,\noptionally with '#' or 'b' appended for sharps or flats.\nFinally the octave number (defaults to octave 4 if not given).\nAn asterisk at the end makes the note a little louder (useful for the beat).\n'r' is a rest.\n\nNote value is a number:\n1=Whole Note; 2=Half Note; 4=Quarter Note, etc.\nDotted notes can be written in two ways:\n1.33 = -2 = dotted half\n2.66 = -4 = dotted quarter\n5.33 = -8 = dotted eighth\n--------------------------------"
 
@@ -32,6 +31,8 @@ class mEnv:
 	instrument = ''
 	outFile = ''
 	trashFile = True
+	preview = False
+	wavData = None
 	def __init__(self):
 		''' Constructor class. '''
 
@@ -89,6 +90,8 @@ class mEnv:
 					except IndexError:
 						print warningStr
 						mEnv()
+				elif comp[0] == 'preview':
+					self.preview = True
 				elif comp[0] == 'save':
 					try:
 						self.outFile = str(comp[1]) + '.wav'
@@ -113,39 +116,35 @@ class mEnv:
 				i += 1
 
 	def play(self, outFile):
-		''' Open the .wav file and play it.'''
-
-		if outFile == '':
-			outFile = 'temp.wav'
+		''' Play the rendered sound, from memory if it was not saved.'''
 
 		a = play_wav.Sound()
-		a.playFile(outFile)
+		if outFile == '':
+			a.playData(self.wavData)
+		else:
+			a.playFile(outFile)
 
 	def removeFile(self, outFile):
 		''' Delete the .wav file.'''
 
-		if outFile == '':
-			outFile = 'temp.wav'
-
-		if self.trashFile:
+		if self.trashFile and outFile != '' and os.path.exists(outFile):
 			os.remove(outFile)
 
 	def synthSounds(self, renderSound, outFile):
-		''' Render sound with pysynth_a, pysynth_b or pysynth_s based on user preference.'''
-
-		if outFile == '':
-			outFile = 'temp.wav'
+		''' Render sound with pysynth_a, pysynth_b or pysynth_s based on user preference.
+		Without a file name to save to, the sound is rendered into memory.'''
 
 		try:
-			# Different cases of input, when optional arguments 'bpm' and 'repeat' are given.
-			if self.bpmVal and self.repeatVal:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True, bpm = self.bpmVal, repeat = self.repeatVal)
-			elif self.bpmVal:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True, bpm = self.bpmVal)
-			elif self.repeatVal:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True, repeat = self.repeatVal)
+			# Optional arguments 'bpm' and 'repeat' are only passed on when given.
+			args = {'silent': True, 'preview': self.preview}
+			if self.bpmVal:
+				args['bpm'] = self.bpmVal
+			if self.repeatVal:
+				args['repeat'] = self.repeatVal
+			if outFile == '':
+				self.wavData = render_bytes(self.synthParam, renderSound, **args)
 			else:
-				renderSound.make_wav(self.synthParam, fn = outFile, silent = True)
+				renderSound.make_wav(self.synthParam, fn = outFile, **args)
 		except KeyError:
 			print warningStr
 			mEnv()
@@ -165,5 +164,7 @@ if __name__ == "__main__":
 			a.trashFile = False
 			if a.outFile == '':
 				a.outFile = 'temp.wav'
+				if a.wavData is not None:
+					open(a.outFile, 'wb').write(a.wavData)
 			print 'Could not play file. Saved to ' + a.outFile
 		a.removeFile(a.outFile)
@@ -1,42 +1,92 @@
 #!/usr/bin/env python
 # -*- coding: latin-1 -*-
 
-# Mix two mono files to get a stereo file
+# Mix mono files to get a stereo (or mono) file
 
-import sys, wave, struct
+# mix() takes any number of 16-bit mono WAV files. Each input is either a
+# file name or a tuple (file name, gain, pan, phase):
+#   gain  -> volume factor (1. = unchanged)
+#   pan   -> -1. (hard left) .. 0. (center) .. 1. (hard right)
+#   phase -> factor for the channel the input is panned away from
+#            (-1. inverts it, which widens the stereo image)
+# The files are processed in blocks of 'chunk' frames, so memory use does
+# not depend on the length of the files.
 
-def mix_files(a, b, c, chann = 2, phase = -1.):
-	f1 = wave.open(a,'r')
-	f2 = wave.open(b,'r')
-	f3 = wave.open(c,'w')
-	f3.setnchannels(chann)
-	f3.setsampwidth(2)
-	f3.setframerate(44100)
-	f3.setcomptype('NONE','Not Compressed')
-	frames = min(f1.getnframes(), f2.getnframes())
-
-	print "Mixing files, total length %.2f s..." % (frames / 44100.)
-	d1 = f1.readframes(frames)
-	d2 = f2.readframes(frames)
-	for n in range(frames):
-		if not n%(5*44100): print n // 44100, 's'
+import sys, wave
+import numpy as np
+import hooks
+
+def pan_gains(gain = 1., pan = 0., phase = 1.):
+	"Return the (left, right) gain pair for an input."
+	near = gain * (1. + abs(pan)) / 2.
+	far = phase * gain * (1. - abs(pan)) / 2.
+	if pan < 0:
+		return near, far
+	return far, near
+
+def mix_weights(inputs, chann = 2):
+	"Return the (chann, len(inputs)) weight matrix for (gain, pan, phase) inputs."
+	w = np.zeros((chann, len(inputs)))
+	for n, (gain, pan, phase) in enumerate(inputs):
 		if chann < 2:
-			d3 = struct.pack('h',
-				.5 * (struct.unpack('h', d1[2*n:2*n+2])[0] +
-				struct.unpack('h', d2[2*n:2*n+2])[0]))
+			w[0, n] = gain / float(len(inputs))
 		else:
-			d3 = ( struct.pack('h',
-				phase * .3 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				.7 * struct.unpack('h', d2[2*n:2*n+2])[0]) +
-				struct.pack('h',
-				.7 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				phase * .3 * struct.unpack('h', d2[2*n:2*n+2])[0]) )
-		f3.writeframesraw(d3)
-	f3.close()
+			w[:2, n] = pan_gains(gain, pan, phase)
+	return w
+
+def mix_block(w, block):
+	"Mix a (inputs, frames) block of samples into interleaved 16-bit frames."
+	out = np.dot(w, block)
+	return np.clip(out, -32768, 32767).astype(np.short).T.tostring()
+
+def mix(inputs, c, chann = 2, chunk = 65536, pad = False, silent = False):
+	fns, params = [], []
+	for inp in inputs:
+		if isinstance(inp, basestring):
+			inp = (inp,)
+		inp = tuple(inp) + (1., 0., 1.)[len(inp) - 1:]
+		fns.append(inp[0])
+		params.append(inp[1:4])
+	w = mix_weights(params, chann)
+
+	files = [wave.open(fn, 'r') for fn in fns]
+	for f in files:
+		if f.getnchannels() != 1 or f.getsampwidth() != 2:
+			raise ValueError("only 16-bit mono files can be mixed")
+	rate = files[0].getframerate()
+	lengths = [f.getnframes() for f in files]
+	frames = max(lengths) if pad else min(lengths)
+
+	out = wave.open(c, 'w')
+	out.setnchannels(chann)
+	out.setsampwidth(2)
+	out.setframerate(rate)
+	out.setcomptype('NONE','Not Compressed')
+
+	if not silent:
+		print "Mixing files, total length %.2f s..." % (frames / float(rate))
+	block = np.zeros((len(files), chunk))
+	for pos in range(0, frames, chunk):
+		k = min(chunk, frames - pos)
+		block[:] = 0.
+		for n, f in enumerate(files):
+			d = np.frombuffer(f.readframes(k), np.short)
+			block[n, :len(d)] = d
+		out.writeframesraw(mix_block(w, block[:, :k]))
+	out.close()
+	for f in files:
+		f.close()
+
+@hooks.timed('mix_files')
+def mix_files(a, b, c, chann = 2, phase = -1.):
+	mix([(a, 1., .4, phase), (b, 1., -.4, phase)], c, chann)
 
 if __name__ == '__main__':
 	if len(sys.argv) == 4:
 		a, b, c = sys.argv[1:]
 		print "Mixing %s and %s, output will be %s" % (a, b, c)
 		mix_files(a, b, c)
-
+	elif len(sys.argv) > 4:
+		c = sys.argv[-1]
+		print "Mixing %s, output will be %s" % (", ".join(sys.argv[1:-1]), c)
+		mix(sys.argv[1:-1], c, pad = True)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+"""
+Render several PySynth songs and mix them into a single WAV file in one
+pass, without writing every part to disk and reading it back again.
+
+The parts are rendered into float arrays (see targets.py) and mixed
+before they are rounded to 16 bits.
+
+A track is a tuple (song, engine, gain, pan) with an optional fifth
+element holding extra make_wav() arguments as a dict, e.g.
+
+  render_tracks([(song4_rh, pysynth_b, 1., .4, {'bpm': 130}),
+                 (song4_lh, pysynth_b, 1., -.4, {'bpm': 130})],
+                fn = "pysynth_bach.wav")
+
+* engine is a PySynth module (pysynth, pysynth_b, pysynth_e, pysynth_s,
+  pysynth_w, pysynth_beeper)
+* gain is a volume factor (1. = unchanged)
+* pan goes from -1. (hard left) over 0. (center) to 1. (hard right)
+
+preview = True renders a quick mono preview at a lower sample rate.
+With a rendercache.RenderCache as cache, tracks rendered before are
+read from the cache. With processes > 1 (0 or None: one per CPU) the
+tracks are rendered at the same time in worker processes, so a song
+takes about as long as its slowest track. A program that renders from a
+thread can pass a multiprocessing Pool forked before its threads were
+started as pool; it is used instead and left open.
+
+With the default pan of +/-.4 and phase of -1. the result is the same as
+rendering both parts and calling mix_files() on them, except that the
+parts are not rounded to 16 bits first.
+"""
+
+import sys, wave, inspect
+from cStringIO import StringIO
+from multiprocessing import Pool, cpu_count
+import numpy as np
+from mixfiles import mix_weights, mix_block
+from targets import render_array, read_wav
+import hooks
+
+def render_track(song, engine, silent = False, precision = np.float32, preview = False, cache = None, **options):
+	"""Render a song with an engine in memory, return (samples, frame rate).
+	The samples are floats in 16-bit units; cache is an optional
+	rendercache.RenderCache."""
+	args = inspect.getargspec(engine.make_wav).args
+	for name, value in (('silent', silent), ('precision', precision), ('preview', preview)):
+		if name in args:
+			options[name] = value
+	if cache is not None:
+		return read_wav(StringIO(cache.render(song, engine, **options)), precision)
+	return render_array(song, engine, precision, **options)
+
+def _render_track(job):
+	"Pool worker: render_track() with the engine module given by name."
+	song, name, args, options = job
+	if name not in sys.modules:
+		__import__(name)
+	if not hooks.active():
+		return render_track(song, sys.modules[name], *args, **options), None
+	# a forked worker starts with the parent's counts, send only its own
+	hooks.reset()
+	rendered = render_track(song, sys.modules[name], *args, **options)
+	return rendered, hooks.snapshot()
+
+@hooks.timed('render_tracks')
+def render_tracks(tracks, fn = "out.wav", chann = 2, phase = -1., silent = False, precision = np.float32, preview = False, cache = None, processes = 1, pool = None):
+	if preview:
+		chann = 1
+	jobs = []
+	for track in tracks:
+		song, engine, gain, pan = track[:4]
+		options = dict(track[4]) if len(track) > 4 else {}
+		jobs.append((song, engine, (silent, precision, preview, cache), options))
+	processes = min(processes or cpu_count(), len(jobs))
+	if pool is not None or processes > 1:
+		# modules cannot be pickled, the workers look them up by name
+		named = [(song, engine.__name__, args, options)
+		         for song, engine, args, options in jobs]
+		if pool is not None:
+			results = pool.map(_render_track, named)
+		else:
+			pool = Pool(processes)
+			try:
+				results = pool.map(_render_track, named)
+				pool.close()
+				pool.join()
+			finally:
+				pool.terminate()
+		rendered = []
+		for part, snap in results:
+			rendered.append(part)
+			hooks.merge(snap)
+	else:
+		rendered = [render_track(song, engine, *args, **options)
+		            for song, engine, args, options in jobs]
+
+	parts = []
+	rate = None
+	for track, (samples, r) in zip(tracks, rendered):
+		gain, pan = track[2:4]
+		if rate is None:
+			rate = r
+		elif r != rate:
+			raise ValueError("tracks have different frame rates")
+		parts.append((samples, gain, pan))
+
+	frames = max(len(p[0]) for p in parts)
+	if not silent:
+		print "Mixing %u tracks, total length %.2f s..." % (len(parts), frames / float(rate))
+	with hooks.timer('mix'):
+		block = np.zeros((len(parts), frames), precision)
+		for n, (samples, gain, pan) in enumerate(parts):
+			block[n, :len(samples)] = samples
+		w = mix_weights([(gain, pan, phase) for samples, gain, pan in parts], chann)
+
+		f = wave.open(fn, 'w')
+		f.setnchannels(chann)
+		f.setsampwidth(2)
+		f.setframerate(rate)
+		f.setcomptype('NONE','Not Compressed')
+		f.writeframes(mix_block(w, block))
+		f.close()
+
+if __name__ == '__main__':
+	import pysynth_b
+	from pysynth_b import song4_rh, song4_lh
+	opts = {'bpm': 130, 'transpose': 1, 'boost': 1.15, 'repeat': 1}
+	render_tracks([(song4_rh, pysynth_b, 1., .4, opts),
+	               (song4_lh, pysynth_b, 1., -.4, opts)], fn = "pysynth_bach.wav")
@@ -9,6 +9,8 @@ import wave
 import os
 import sys
 import string
+import tempfile
+from cStringIO import StringIO
 
 pyaudioFound = False
 tkSnackFound = False
@@ -48,6 +50,22 @@ class Sound:
 			else:
 				self.play_media(mediaFile)
 
+	def playData(self, data, repeat = 0):
+		''' Play a WAV file held in memory (a string).'''
+
+		if pyaudioFound:
+			for n in range(repeat + 1):
+				self.play_pyaudio(StringIO(data))
+			return
+		# the other backends need a file name
+		fd, mediaFile = tempfile.mkstemp(suffix = '.wav')
+		try:
+			os.write(fd, data)
+			os.close(fd)
+			self.playFile(mediaFile, repeat)
+		finally:
+			os.remove(mediaFile)
+
 	def play_pyaudio(self, mediaFile):
 		''' Use pyaudio backend to play the .wav.'''
 
@@ -31,9 +31,9 @@
 # 5.33 = -8 = dotted eighth
 """
 
-import wave, struct
 import numpy as np
-from math import sin, cos, pi, log, exp
+from mixfiles import mix_files
+from math import pi, log
 
 # Example 1: The C major scale
 song1 = [
@@ -91,77 +91,12 @@ song4_lh = (
 )
 
 ##########################################################################
-# Compute and print piano key frequency table
+# Piano key frequency table (built in tables.py)
 ##########################################################################
-pitchhz, keynum = {}, {}
-keys_s = ('a', 'a#', 'b', 'c', 'c#', 'd', 'd#', 'e', 'f', 'f#', 'g', 'g#')
-keys_f = ('a', 'bb', 'b', 'c', 'db', 'd', 'eb', 'e', 'f', 'gb', 'g', 'ab')
-
-# Harmonic intensities (dB) for selected piano keys,
-# measured with output from a Yamaha P-85
-harmo = (
-  (1, -15.8, -3., -15.3, -22.8, -40.7),
-  (16, -15.8, -3., -15.3, -22.8, -40.7),
-  (28, -5.7, -4.4, -17.7, -16., -38.7),
-  (40, -6.8, -17.2, -22.4, -16.8, -75.6),
-  (52, -8.4, -19.7, -23.5, -21.6, -76.8),
-  (64, -9.3, -20.8, -37.2, -36.3, -76.4),
-  (76, -18., -64.5, -74.4, -77.3, -80.8),
-  (88, -24.8, -53.8, -77.2, -80.8, -90.),
-)
-
-def linint(arr, x):
-	"Interpolate an (X, Y) array linearly."
-	for v in arr:
-		if v[0] == x: return v[1]
-	xvals = [v[0] for v in arr]
-	ux = max(xvals)
-	lx = min(xvals)
-	try: assert lx <= x <= ux
-	except:
-		#print lx, x, ux
-		raise
-	for v in arr:
-		if v[0] > x and v[0] - x <= ux - x:
-			ux = v[0]
-			uy = v[1]
-		if v[0] < x and x - v[0] >= lx - x:
-			lx = v[0]
-			ly = v[1]		
-	#print lx, ly, ux, uy
-	return (float(x) - lx) / (ux - lx) * (uy - ly) + ly
-
-
-#if __name__ == '__main__':
-    #print "Piano key frequencies (for equal temperament):"
-    #print "Key number\tScientific name\tFrequency (Hz)"
-for k in range(88):
-    freq = 27.5 * 2.**(k/12.)
-    oct = (k+9) // 12
-    note = '%s%u' % (keys_s[k%12], oct)
-    #if __name__ == '__main__':
-    #    print "%10u\t%15s\t%14.2f" % (k+1, note.upper(), freq)
-    pitchhz[note] = freq
-    keynum[note] = k
-    note = '%s%u' % (keys_f[k%12], oct)
-    pitchhz[note] = freq
-    keynum[note] = k
-
-harmtab = np.zeros((88, 20))
-
-for h in range(1, len(harmo[0])):
-	dat = []
-	for n in range(len(harmo)):
-		dat.append((float(harmo[n][0]), harmo[n][h]))
-	for h2 in range(88):
-		harmtab[h2,h] = linint(dat, h2+1)
-
-#print harmtab[keynum['c4'],:]
-for h2 in range(88):
-	for n in range(20):
-		ref = harmtab[h2,1]
-		harmtab[h2,n] = 10.**((harmtab[h2,n] - ref)/20.)
-#print harmtab[keynum['c4'],:]
+import tables, engine
+# pitchhz and keynum were built here before tables.py; they stay
+# importable from this module for scripts that use them
+from tables import pitchhz, keynum, keyhz, volfac, RATE
 
 ##########################################################################
 #### Main program starts below
@@ -183,6 +118,16 @@ for h2 in range(88):
 # Output file name
 #fn = 'pysynth_output.wav'
 
+# Sample rate (Hz) and seconds of silence after the last note
+# e.g. rate = 44100, tail = 2.
+
+# Fast preview: lower sample rate, shorter notes and tail
+# e.g. preview = True
+
+# Sample format used while rendering; float32 halves memory and
+# bandwidth compared to float64 and is plenty for 16-bit output
+# e.g. precision = np.float32
+
 # Other parameters:
 
 # Influences the decay of harmonics over frequency. Lowering the
@@ -192,161 +137,79 @@ for h2 in range(88):
 harm_max = 5.
 ##########################################################################
 
-data = []
-note_cache = {}
-cache_this = {}
-
-def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav", silent=False):
-	f=wave.open(fn,'w')
-
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(44100)
-	f.setcomptype('NONE','Not Compressed')
-
-	bpmfac = 120./bpm
-
-	def length(l):
-	    return 88200./l*bpmfac
-
-	def waves2(hz,l):
-	    a=44100./hz
-	    b=float(l)/44100.*hz
-	    return [a,round(b)]
-
-	att_len = 3000
-	att_bass = np.zeros(att_len)
-	att_treb = np.zeros(att_len)
-	for n in range(att_len):
-		att_treb[n] = linint(((0,0.), (100, .2), (300, .7), (400, .6), (600, .25), (800, .9), (1000, 1.25), (2000,1.15), (3000, 1.)), n)
-		att_bass[n] = linint(((0,0.), (100, .1), (300, .2), (400, .15), (600, .1), (800, .9), (1000, 1.25), (2000,1.15), (3000, 1.)), n)
-	decay = np.zeros(1000)
-	for n in range(900):
-		decay[n] = exp(linint(( (0,log(3)), (3,log(5)), (5, log(1.)), (6, log(.8)), (9,log(.1)) ), n/100.))
-
-	def render2(a, b, vol, pos, knum, note):
-	    l=waves2(a, b)
-	    q=int(l[0]*l[1])
-
-	    lf = log(a)
-	    t = (lf-3.) / (8.5-3.)
-	    volfac = 1. + .8 * t * cos(pi/5.3*(lf-3.))
-	    schweb = waves2(lf*100., b)[0]
-	    schweb_amp = .05 - (lf-5.) / 100.
-	    att_fac = min(knum / 87. * vol, 1.)
-	    snd_len = max(int(3.1*q), 44100)
-	    fac = np.ones(snd_len)
-	    fac[:att_len] = att_fac * att_treb + (1.-att_fac) * att_bass
-
-	    raw_note = 12*44100
-	    if note not in note_cache.keys():
-	        x2 = np.arange(raw_note)
-	    	sina = 2. * pi * x2 / float(l[0])
-		ov = np.exp(-x2/3./decay[int(lf*100)]/44100.)
-	   	new = (( np.sin(sina)
-	              + ov*harmtab[kn,2]*np.sin(2. * sina)
-	              + ov*harmtab[kn,3]*np.sin(3. * sina)
-	              + ov*harmtab[kn,4]*np.sin(4. * sina)
-	              + ov*harmtab[kn,5]*np.sin(8. * sina)
-			) * volfac )
-		new *= np.exp(-x2/decay[int(lf*100)]/44100.)
-		if cache_this[note] > 1:
-			note_cache[note] = new.copy()
-			#print "Caching", note
-	    else:
-		new = note_cache[note].copy()
-	    dec_ind = int(leg_stac*q)
-	    new[dec_ind:] *= np.exp(-np.arange(raw_note-dec_ind)/3000.)
-	    #print snd_len, raw_note
-	    data[pos:pos+snd_len] += ( new[:snd_len] * fac * vol *
-		       (1. + schweb_amp * np.sin(2. * pi * np.arange(snd_len)/schweb/32.) )  )
-
-	ex_pos = 0.
-	t_len = 0
-	for y, x in song:
-		if x < 0:
-			t_len+=length(-2.*x/3.)
-		else:
-			t_len+=length(x)
-		if y[-1] == '*':
-			y = y[:-1]
-		if not y[-1].isdigit():
-			y += '4'
-		cache_this[y] = cache_this.get(y, 0) + 1
-	#print "Note frequencies in song:", cache_this
-	data = np.zeros((repeat+1)*t_len + 441000.)
-	#print len(data)/44100., "s allocated"
-
-	for rp in range(repeat+1):
-		for nn, x in enumerate(song):
-		    if not nn % 4 and silent == False:
-		        print "[%u/%u]\t" % (nn+1,len(song))
-		    if x[0]!='r':
-		        if x[0][-1] == '*':
-		            vol = boost
-		            note = x[0][:-1]
-		        else:
-		            vol = 1.
-		            note = x[0]
-			if not note[-1].isdigit():
-			    note += '4'		# default to fourth octave
-		        a=pitchhz[note]
-			kn = keynum[note]
-		        a = a * 2**transpose
-		        if x[1] < 0:
-		            b=length(-2.*x[1]/3.)
-		        else:
-		            b=length(x[1])
-
-		        render2(a, b, vol, int(ex_pos), kn, note)
-			ex_pos = ex_pos + b
-
-		    if x[0]=='r':
-		        b=length(x[1])
-			ex_pos = ex_pos + b
-
-	##########################################################################
-	# Write to output file (in WAV format)
-	##########################################################################
-	if silent == False:
-		print "Writing to file", fn
-
-	data = data / (data.max() * 2.)
-	out_len = int(2. * 44100. + ex_pos+.5)
-	data2 = np.zeros(out_len, np.short)
-	data2[:] = 32000. * data[:out_len]
-	f.writeframes(data2.tostring())
-	f.close()
-	print
-
-def mix_files(a, b, c, chann = 2, phase = -1.):
-	f1 = wave.open(a,'r')
-	f2 = wave.open(b,'r')
-	f3 = wave.open(c,'w')
-	f3.setnchannels(chann)
-	f3.setsampwidth(2)
-	f3.setframerate(44100)
-	f3.setcomptype('NONE','Not Compressed')
-	frames = min(f1.getnframes(), f2.getnframes())
-
-	print "Mixing files, total length %.2f s..." % (frames / 44100.)
-	d1 = f1.readframes(frames)
-	d2 = f2.readframes(frames)
-	for n in range(frames):
-		if not n%(5*44100): print n // 44100, 's'
-		if chann < 2:
-			d3 = struct.pack('h',
-				.5 * (struct.unpack('h', d1[2*n:2*n+2])[0] +
-				struct.unpack('h', d2[2*n:2*n+2])[0]))
+class Engine(engine.Engine):
+	"""Piano: additive synthesis with harmonics measured on a real piano.
+
+	With resample = N only every Nth key is synthesized (and cached); the
+	keys in between are resampled from the next higher of these reference
+	keys, e.g. N = 3 (a minor third) or 12 (an octave)."""
+
+	def __init__(self, leg_stac = .9, resample = 0, **kw):
+		engine.Engine.__init__(self, **kw)
+		self.leg_stac = leg_stac
+		self.resample = resample
+
+	def wave(self, a, kn, n, cacheable = True):
+		"The tone of key kn at a Hz before its release, n samples long."
+		precision = self.precision
+		key = kn, self.transpose, np.dtype(precision), self.rate, n
+		new = self.cache.get(key)
+		if new is None:
+			decay = tables.decay()
+			harmtab = tables.harmtab()
+			lf = log(a)
+			x2 = np.arange(n, dtype=precision)
+			sina = self.phase(n, float(self.rate) / a)
+			ov = np.exp(-x2/3./decay[int(lf*100)]/self.rate)
+			new = (( np.sin(sina)
+			      + ov*harmtab[kn,2]*np.sin(2. * sina)
+			      + ov*harmtab[kn,3]*np.sin(3. * sina)
+			      + ov*harmtab[kn,4]*np.sin(4. * sina)
+			      + ov*harmtab[kn,5]*np.sin(8. * sina)
+				) * volfac(a) )
+			new *= np.exp(-x2/decay[int(lf*100)]/self.rate)
+			if cacheable:
+				new = self.cache.put(key, new)
+		return new
+
+	def note(self, a, b, vol, kn, cacheable):
+		rate, precision = self.rate, self.precision
+		att_treb, att_bass = tables.attack(rate)
+		att_len = len(att_treb)
+
+		l = self.waves2(a, b)
+		q = int(l[0]*l[1])
+
+		lf = log(a)
+		schweb = self.waves2(lf*100., b)[0]
+		schweb_amp = .05 - (lf-5.) / 100.
+		att_fac = min(kn / 87. * vol, 1.)
+		raw_note = int(self.ring * rate)
+		snd_len = min(max(int(3.1*q), rate), raw_note)
+		fac = np.ones(snd_len, precision)
+		fac[:att_len] = att_fac * att_treb + (1.-att_fac) * att_bass
+
+		N = self.resample
+		if N and kn % N and kn < 87:
+			ref = min(kn - kn % N + N, 87)
+			a_ref = keyhz[ref] * 2**self.transpose
+			new = engine.resample(self.wave(a_ref, ref, raw_note), a / a_ref, snd_len)
+			new *= volfac(a) / volfac(a_ref)
 		else:
-			d3 = ( struct.pack('h',
-				phase * .3 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				.7 * struct.unpack('h', d2[2*n:2*n+2])[0]) +
-				struct.pack('h',
-				.7 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				phase * .3 * struct.unpack('h', d2[2*n:2*n+2])[0]) )
-		f3.writeframesraw(d3)
-	f3.close()
+			new = self.wave(a, kn, raw_note, cacheable or N)[:snd_len].copy()
+		dec_ind = int(self.leg_stac*q)
+		new[dec_ind:] *= np.exp(-np.arange(snd_len-dec_ind, dtype=precision)/(3000.*rate/44100.))
+		return ( new * fac * vol *
+		       (1. + schweb_amp * np.sin(2. * pi * np.arange(snd_len, dtype=precision)/schweb/32.) )  )
+
+# Notes cached by make_wav(), shared by all calls
+note_cache = engine.NoteCache()
+
+def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav", silent=False, precision=np.float32, rate=RATE, tail=2., preview=False, threads=1, processes=1, resample=0):
+	Engine(bpm=bpm, transpose=transpose, leg_stac=leg_stac, resample=resample, boost=boost,
+	       repeat=repeat, silent=silent, precision=precision, rate=rate,
+	       tail=tail, preview=preview, threads=threads,
+	       processes=processes, cache=note_cache).make_wav(song, fn)
 
 ##########################################################################
 # Synthesize demo songs
@@ -1,8 +1,11 @@
 import logging
 import math
-import struct 
 import wave
 
+import numpy as np
+
+from tables import PREVIEW_RATE
+
 LOG = logging.getLogger("pysynth_beeper")
 SAMPLING_RATE = 44100
 
@@ -14,100 +17,94 @@ for k in range(88):
     note = '%s%u' % (keys_s[k % 12], oct)
     PITCHHZ[note] = freq
 
-def make_wav(song, tempo=120, transpose=0, fn="out.wav"):
+# Define a waveform that looks something like this
+# \        /
+#__\_____ /__
+#   \  /\/
+#    \/
+
+# Format:  [(start, end, start_level, end_level), ...]
+WAVEFORM = [(0.0, 0.3,  1.0, -1.0),
+            (0.3, 0.5, -1.0,  0.0),
+            (0.5, 0.6,  0.0, -0.5),
+            (0.6, 1.0, -0.5,  1.0)]
+
+# One period of the beep per period length in samples, shared by all
+# notes and songs: (levels, levels as 16-bit samples)
+_periods = {}
+
+def sixteenbit(levels):
+    # round half away from zero, like round() did per sample
+    x = 32000 * levels
+    return np.trunc(x + np.copysign(.5, x)).astype(np.short)
+
+def beep_single_period(period):
+    if period in _periods:
+        return _periods[period]
+
+    # Position inside the period, 0..1
+    pos = np.arange(period) / float(period)
+
+    # Synth 1, using sine waves
+    level1 = (np.sin(2. * math.pi * pos) + np.sin(2. * math.pi * pos * 2)) / 2
+
+    # Synth 2, discrete, using the waveform definition (first matching segment)
+    conds, levels = [], []
+    for start, finish, start_level, finish_level in WAVEFORM:
+        conds.append((pos >= start) & (pos <= finish))
+        localpos = (pos - start) / (finish - start)
+        levels.append((finish_level - start_level) * localpos + start_level)
+    level2 = np.select(conds, levels)
+
+    # Put both samples together
+    level = (level1 + level2) / 2
+    _periods[period] = level, sixteenbit(level)
+    return _periods[period]
+
+def beep(freq, duration, rate, fade):
+    "Samples of a beep of freq Hz, duration samples long, faded in and out."
+    period = int(rate / 4 / freq)
+    period_waveform, period_waveform_packed = beep_single_period(period)
+    out = np.resize(period_waveform_packed, duration)
+
+    # At borders we do fade in and fade out
+    x = np.arange(duration)
+    edge = np.minimum(x, duration - x)
+    border = np.flatnonzero(edge < fade)
+    out[border] = sixteenbit(period_waveform[border % period] * (edge[border] / float(fade)))
+    return out
+
+def make_wav(song, tempo=120, transpose=0, fn="out.wav", rate=SAMPLING_RATE, preview=False):
     f = wave.open(fn, 'w')
 
+    if preview:
+        rate = PREVIEW_RATE
     f.setnchannels(1)
     f.setsampwidth(2)
-    f.setframerate(SAMPLING_RATE)
+    f.setframerate(rate)
     f.setcomptype('NONE', 'Not Compressed')
 
-    # Define a waveform that looks something like this
-    # \        /
-    #__\_____ /__
-    #   \  /\/        
-    #    \/
-    
-    # Format:  [(start, end, start_level, end_level), ...]        
-    waveform = [(0.0, 0.3,  1.0, -1.0), 
-                (0.3, 0.5, -1.0,  0.0), 
-                (0.5, 0.6,  0.0, -0.5), 
-                (0.6, 1.0, -0.5,  1.0)]
-
     # BPM is "quarter notes per minute"
-    full_notes_per_second = float(tempo) / 60 / 4 
-    full_note_in_samples = SAMPLING_RATE / full_notes_per_second
-
-    def sixteenbit(sample):
-        return struct.pack('h', round(32000 * sample))
-
-    
-    def beep_single_period(period):
-        asin = lambda x: math.sin(2. * math.pi * x)
-        
-        period_waveform = []
-        for x in xrange(period):
-            # Position inside current period, 0..1            
-            pos = float(x) / period
-            
-            # Synth 1, using sine waves
-            level1 = (asin(pos) + asin(pos * 2)) / 2
-            
-            # Synth 2, discrete, using waveform definition
-            for start, finish, start_level, finish_level in waveform:
-                if pos >= start and pos <= finish:
-                    localpos = (pos - start) / (finish - start)
-                    level2 = (finish_level - start_level) * localpos + start_level
-                    break
-            
-            # Put both samples together, apply fadein/fadeout
-            level = (level1 + level2) / 2
-            period_waveform.append(level)
-            #period_waveform_packed.append(sixteenbit(level))    
-    
-        return period_waveform, "".join(sixteenbit(l) for l in period_waveform)
-    
-    def beep(freq, duration, sink):
-        ow = ""
-
-        period = int(SAMPLING_RATE / 4 / freq)
-        period_waveform, period_waveform_packed = beep_single_period(period)
-
-        x = 0 
-        while x < duration:
-            if x < 100 or duration - x < 100:
-                # At borders we do fade in and fade out
-                fade_multiplier = min(x, duration - x) / 100.0
-                ow += sixteenbit(period_waveform[x % period] * fade_multiplier)
-                x += 1
-            else:
-                if x % period == 0:
-                    # Optimization:
-                    # We're aligned with waveform, can fill ow in batches!
-                    while x + period + 100 < duration:
-                        ow += period_waveform_packed
-                        x += period
-
-                # Go sample-by-sample
-                ow += sixteenbit(period_waveform[x % period])
-                x += 1
-
-        sink.writeframesraw(ow)
-
-    def silence(duration, sink):
-        sink.writeframesraw(sixteenbit(0) * int(duration))
+    full_notes_per_second = float(tempo) / 60 / 4
+    full_note_in_samples = rate / full_notes_per_second
 
+    # Fade in/out length, 100 samples at 44.1 kHz
+    fade = max(int(100 * rate / SAMPLING_RATE), 1)
+
+    parts = []
     for note_pitch, note_duration in song:
         # note_duration is 1, 2, 4, 8, ... and actually means 1, 1/2, 1/4, ...
-        duration = int(full_note_in_samples / note_duration) 
-        
+        duration = max(int(full_note_in_samples / note_duration), 0)
+
         if note_pitch == "r":
             LOG.debug("Silence for %d samples" % duration)
-            silence(duration, f)
+            parts.append(np.zeros(duration, np.short))
         else:
             freq = PITCHHZ[note_pitch]
             freq *= 2 ** transpose
             LOG.debug("%d Hz for %d samples" % (freq, duration))
-            beep(freq, duration, f)
+            parts.append(beep(freq, duration, rate, fade))
 
+    if parts:
+        f.writeframes(np.concatenate(parts).tostring())
     f.close()
@@ -31,9 +31,9 @@
 # 5.33 = -8 = dotted eighth
 """
 
-import wave, struct
 import numpy as np
-from math import sin, cos, pi, log, exp, floor, ceil
+from mixfiles import mix_files
+from math import cos, pi, log, floor, ceil
 
 # Example 1: The C major scale
 song1 = [
@@ -91,48 +91,12 @@ song4_lh = (
 )
 
 ##########################################################################
-# Compute and print piano key frequency table
+# Piano key frequency table (built in tables.py)
 ##########################################################################
-pitchhz, keynum = {}, {}
-keys_s = ('a', 'a#', 'b', 'c', 'c#', 'd', 'd#', 'e', 'f', 'f#', 'g', 'g#')
-keys_f = ('a', 'bb', 'b', 'c', 'db', 'd', 'eb', 'e', 'f', 'gb', 'g', 'ab')
-
-def linint(arr, x):
-	"Interpolate an (X, Y) array linearly."
-	for v in arr:
-		if v[0] == x: return v[1]
-	xvals = [v[0] for v in arr]
-	ux = max(xvals)
-	lx = min(xvals)
-	try: assert lx <= x <= ux
-	except:
-		#print lx, x, ux
-		raise
-	for v in arr:
-		if v[0] > x and v[0] - x <= ux - x:
-			ux = v[0]
-			uy = v[1]
-		if v[0] < x and x - v[0] >= lx - x:
-			lx = v[0]
-			ly = v[1]		
-	#print lx, ly, ux, uy
-	return (float(x) - lx) / (ux - lx) * (uy - ly) + ly
-
-
-#if __name__ == '__main__':
-    #print "Piano key frequencies (for equal temperament):"
-    #print "Key number\tScientific name\tFrequency (Hz)"
-for k in range(88):
-    freq = 27.5 * 2.**(k/12.)
-    oct = (k+9) // 12
-    note = '%s%u' % (keys_s[k%12], oct)
-    #if __name__ == '__main__':
-    #    print "%10u\t%15s\t%14.2f" % (k+1, note.upper(), freq)
-    pitchhz[note] = freq
-    keynum[note] = k
-    note = '%s%u' % (keys_f[k%12], oct)
-    pitchhz[note] = freq
-    keynum[note] = k
+import engine
+# pitchhz and keynum were built here before tables.py; they stay
+# importable from this module for scripts that use them
+from tables import pitchhz, keynum, RATE
 
 ##########################################################################
 #### Main program starts below
@@ -154,145 +118,73 @@ for k in range(88):
 # Output file name
 #fn = 'pysynth_output.wav'
 
-data = []
-
-def make_wav(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,fn="out.wav",silent=False):
-	f=wave.open(fn,'w')
-
-	f.setnchannels(1)
-	f.setsampwidth(2)
-	f.setframerate(44100)
-	f.setcomptype('NONE','Not Compressed')
-
-	bpmfac = 120./bpm
-
-	def length(l):
-	    return 88200./l*bpmfac
-
-	def waves2(hz,l):
-	    a=44100./hz
-	    b=float(l)/44100.*hz
-	    return [a,round(b)]
-
-	def asin(x):
-	    return sin(2.*pi*x)
-
-	def render2(a, b, vol, pos, knum, endamp = .25, sm = 10):
-	    b2 = (1. - pause) * b
-	    l=waves2(a, b2)
-	    ow=""
-	    q=int(l[0]*l[1])
-
-	    lf = log(a)
-	    t = (lf-3.) / (8.5-3.)
-	    volfac = 1. + .8 * t * cos(pi/5.3*(lf-3.))
-	    snd_len = int((10.-lf)*q)
-	    if lf < 4: snd_len *= 2
-	    x = np.arange(snd_len)
-	    s = x / float(q)
-
-	    ls = np.log(1. + s)
-	    kp_len = int(l[0])
-	    kps1 = np.zeros(snd_len)
-	    kps2 = np.zeros(snd_len)
-	    kps1[:kp_len] = np.random.normal(size = kp_len)
-
-	    for t in range(kp_len):
-		kps2[t] = kps1[t:t+sm].mean()
-	    delt = float(l[0])
-	    li = int(floor(delt))
-	    hi = int(ceil(delt))
-	    ifac = delt % 1
-	    delt2 = delt * (floor(delt) - 1) / floor(delt)
-	    ifac2 = delt2 % 1
-	    falloff = (4./lf*endamp)**(1./l[1])
-	    for t in range(hi, snd_len):
-		v1 = ifac * kps2[t-hi]   + (1.-ifac) * kps2[t-li]
-		v2 = ifac2 * kps2[t-hi+1] + (1.-ifac2) * kps2[t-li+1]
-	        kps2[t] += .5 * (v1 + v2) * falloff
-	    data[pos:pos+snd_len] += kps2*vol*volfac
-
-	ex_pos = 0.
-	t_len = 0
-	for y, x in song:
-		if x < 0:
-			t_len+=length(-2.*x/3.)
-		else:
-			t_len+=length(x)
-	data = np.zeros((repeat+1)*t_len + 20. * 44100.)
-	#print len(data)/44100., "s allocated"
-
-	for rp in range(repeat+1):
-		for nn, x in enumerate(song):
-		    if not nn % 4 and silent == False:
-		        print "[%u/%u]\t" % (nn+1,len(song))
-		    if x[0]!='r':
-		        if x[0][-1] == '*':
-		            vol = boost
-		            note = x[0][:-1]
-		        else:
-		            vol = 1.
-		            note = x[0]
-			try:
-		            a=pitchhz[note]
-			    kn = keynum[note]
-			except:
-		            a=pitchhz[note + '4']	# default to fourth octave
-			    kn = keynum[note + '4']
-		        a = a * 2**transpose
-		        if x[1] < 0:
-		            b=length(-2.*x[1]/3.)
-		        else:
-		            b=length(x[1])
-		        render2(a, b, vol, int(ex_pos), kn)
-			ex_pos = ex_pos + b
-
-		    if x[0]=='r':
-		        b=length(x[1])
-			ex_pos = ex_pos + b
-
-	##########################################################################
-	# Write to output file (in WAV format)
-	##########################################################################
-	if silent == False:
-		print "Writing to file", fn
-
-	data = data / (data.max() * 2.)
-	out_len = int(2. * 44100. + ex_pos+.5)
-	data2 = np.zeros(out_len, np.short)
-	data2[:] = 32000. * data[:out_len]
-	f.writeframes(data2.tostring())
-	f.close()
-	print
-
-def mix_files(a, b, c, chann = 2, phase = -1.):
-	f1 = wave.open(a,'r')
-	f2 = wave.open(b,'r')
-	f3 = wave.open(c,'w')
-	f3.setnchannels(chann)
-	f3.setsampwidth(2)
-	f3.setframerate(44100)
-	f3.setcomptype('NONE','Not Compressed')
-	frames = min(f1.getnframes(), f2.getnframes())
-
-	print "Mixing files, total length %.2f s..." % (frames / 44100.)
-	d1 = f1.readframes(frames)
-	d2 = f2.readframes(frames)
-	for n in range(frames):
-		if not n%(5*44100): print n // 44100, 's'
-		if chann < 2:
-			d3 = struct.pack('h',
-				.5 * (struct.unpack('h', d1[2*n:2*n+2])[0] +
-				struct.unpack('h', d2[2*n:2*n+2])[0]))
-		else:
-			d3 = ( struct.pack('h',
-				phase * .3 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				.7 * struct.unpack('h', d2[2*n:2*n+2])[0]) +
-				struct.pack('h',
-				.7 * struct.unpack('h', d1[2*n:2*n+2])[0] +
-				phase * .3 * struct.unpack('h', d2[2*n:2*n+2])[0]) )
-		f3.writeframesraw(d3)
-	f3.close()
+# Sample rate (Hz) and seconds of silence after the last note
+# e.g. rate = 44100, tail = 2.
+
+# Fast preview: lower sample rate, shorter notes and tail
+# e.g. preview = True
+
+# Sample format used while rendering; float32 halves memory and
+# bandwidth compared to float64 and is plenty for 16-bit output
+# e.g. precision = np.float32
+
+class Engine(engine.Engine):
+	"Karplus-Strong plucked string."
+
+	ring = None
+	extra = 20.
+	# the string loop runs in Python and holds the GIL, so threads
+	# do not help; use processes instead
+	parallel = False
+
+	def __init__(self, pause = 0., **kw):
+		engine.Engine.__init__(self, **kw)
+		self.pause = pause
+
+	def prepare(self, args):
+		# Draw the pluck noise in song order, so the output only depends
+		# on the global RNG state and not on how the notes are rendered.
+		return args + (np.random.normal(size = int(self.waves2(args[0], 0)[0])),)
+
+	def note(self, a, b, vol, kn, cacheable, noise, endamp = .25, sm = 10):
+		b2 = (1. - self.pause) * b
+		l = self.waves2(a, b2)
+		q = int(l[0]*l[1])
+
+		lf = log(a)
+		t = (lf-3.) / (8.5-3.)
+		volfac = 1. + .8 * t * cos(pi/5.3*(lf-3.))
+		snd_len = int((10.-lf)*q)
+		if lf < 4: snd_len *= 2
+		if self.ring: snd_len = min(snd_len, int(self.ring * self.rate))
+
+		# the string loop runs per sample in Python, where float64
+		# scalars are faster; only the song buffer uses 'precision'
+		kp_len = int(l[0])
+		kps1 = np.zeros(snd_len)
+		kps2 = np.zeros(snd_len)
+		kps1[:kp_len] = noise
+
+		for t in range(kp_len):
+			kps2[t] = kps1[t:t+sm].mean()
+		delt = float(l[0])
+		li = int(floor(delt))
+		hi = int(ceil(delt))
+		ifac = delt % 1
+		delt2 = delt * (floor(delt) - 1) / floor(delt)
+		ifac2 = delt2 % 1
+		falloff = (4./lf*endamp)**(1./l[1])
+		for t in range(hi, snd_len):
+			v1 = ifac * kps2[t-hi]   + (1.-ifac) * kps2[t-li]
+			v2 = ifac2 * kps2[t-hi+1] + (1.-ifac2) * kps2[t-li+1]
+			kps2[t] += .5 * (v1 + v2) * falloff
+		return kps2*vol*volfac
+
+def make_wav(song,bpm=120,transpose=0,pause=0.,boost=1.1,repeat=0,fn="out.wav",silent=False,precision=np.float32,rate=RATE,tail=2.,preview=False,threads=1,processes=1):
+	Engine(bpm=bpm, transpose=transpose, pause=pause, boost=boost,
+	       repeat=repeat, silent=silent, precision=precision, rate=rate,
+	       tail=tail, preview=preview, threads=threads,
+	       processes=processes).make_wav(song, fn)
 
 ##########################################################################
 # Synthesize demo songs
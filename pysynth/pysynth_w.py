@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: latin-1 -*-
+
+"""
+##########################################################################
+#                       * * *  PySynth  * * *
+#       A very basic audio synthesizer in Python (www.python.org)
+##########################################################################
+
+# Wavetable version of the piano in pysynth_b.
+
+# Instead of summing sines for every note, one cycle of each key's tone
+# (the fundamental and the overtones, see tables.wavetable()) is computed
+# once and the notes are read from it with a phase accumulator and linear
+# interpolation. Only the samples that are played are synthesized, so
+# there is no need for a note cache. The sound is close to pysynth_b.
+
+# 'song' is a Python list (or tuple) in which the song is defined,
+#   the format is [['note', value]], see pysynth_b.py
+"""
+
+import numpy as np
+from mixfiles import mix_files
+from math import log
+
+import tables, engine
+from tables import volfac, RATE, WAVETABLE_SIZE
+from pysynth_b import song1, song2, song3, song4_rh, song4_lh
+
+##########################################################################
+#### Main program starts below
+##########################################################################
+# Some parameters:
+
+# Beats (quarters) per minute
+# e.g. bpm = 95
+
+# Octave shift (neg. integer -> lower; pos. integer -> higher)
+# e.g. transpose = 0
+
+# Playing style (e.g., 0.8 = very legato and e.g., 0.3 = very staccato)
+# e.g. leg_stac = 0.6
+
+# Volume boost for asterisk notes (1. = no boost)
+# e.g. boost = 1.2
+
+# Output file name
+#fn = 'pysynth_output.wav'
+
+# Sample rate (Hz) and fast preview at a lower sample rate
+# e.g. rate = 44100, preview = True
+
+# Floating point precision of the synthesis
+# e.g. precision = np.float32
+##########################################################################
+
+class Engine(engine.Engine):
+	"Piano: pysynth_b's harmonics played from one-cycle wavetables."
+
+	def __init__(self, leg_stac = .9, **kw):
+		engine.Engine.__init__(self, **kw)
+		self.leg_stac = leg_stac
+
+	def cycle(self, n, inc):
+		"""Table index and interpolation factor of n samples, advancing
+		inc table samples per sample."""
+		# 32.32 fixed point phase accumulator
+		ph = np.arange(n, dtype=np.int64) * int(inc * 2**32)
+		i = (ph >> 32) & (WAVETABLE_SIZE - 1)
+		frac = (ph & 0xffffffff).astype(self.precision) * 2.**-32
+		return i, frac
+
+	def note(self, a, b, vol, kn, cacheable):
+		rate, precision = self.rate, self.precision
+		decay = tables.decay()[int(log(a)*100)]
+		att_treb, att_bass = tables.attack(rate)
+		att_len = len(att_treb)
+
+		l = self.waves2(a, b)
+		q = int(l[0]*l[1])
+		lf = log(a)
+		schweb = self.waves2(lf*100., b)[0]
+		schweb_amp = .05 - (lf-5.) / 100.
+		att_fac = min(kn / 87. * vol, 1.)
+		snd_len = min(max(int(3.1*q), rate), int(self.ring * rate))
+
+		fund, over = tables.wavetable(kn, np.dtype(precision))
+		i, frac = self.cycle(snd_len, WAVETABLE_SIZE / l[0])
+		new = fund[i]
+		new += frac * (fund[i+1] - new)
+		o0 = over[i]
+		o0 += frac * (over[i+1] - o0)
+
+		x2 = np.arange(snd_len, dtype=precision)
+		ov = np.exp(x2 * (-1./3./decay/rate))
+		new += ov * o0
+		ov *= ov * ov		# exp(-x2/decay/rate)
+		new *= ov
+		new *= volfac(a) * vol
+		new[:att_len] *= att_fac * att_treb + (1.-att_fac) * att_bass
+		dec_ind = int(self.leg_stac*q)
+		new[dec_ind:] *= np.exp(-np.arange(snd_len-dec_ind, dtype=precision)/(3000.*rate/44100.))
+
+		# slow beating, read from the fundamental (a sine)
+		i, frac = self.cycle(snd_len, WAVETABLE_SIZE / schweb / 32.)
+		lfo = fund[i]
+		lfo += frac * (fund[i+1] - lfo)
+		new *= 1. + schweb_amp * lfo
+		return new
+
+def make_wav(song,bpm=120,transpose=0,leg_stac=.9,boost=1.1,repeat=0,fn="out.wav", silent=False, precision=np.float32, rate=RATE, tail=2., preview=False, threads=1, processes=1):
+	Engine(bpm=bpm, transpose=transpose, leg_stac=leg_stac, boost=boost,
+	       repeat=repeat, silent=silent, precision=precision, rate=rate,
+	       tail=tail, preview=preview, threads=threads,
+	       processes=processes).make_wav(song, fn)
+
+##########################################################################
+# Synthesize demo songs
+##########################################################################
+
+if __name__ == '__main__':
+	print "Creating Demo Songs..."
+	print
+
+	make_wav(song4_rh, bpm = 130, transpose = 1, boost = 1.15, repeat = 1, fn = "pysynth_bach_rh.wav")
+	make_wav(song4_lh, bpm = 130, transpose = 1, boost = 1.15, repeat = 1, fn = "pysynth_bach_lh.wav")
+	mix_files("pysynth_bach_rh.wav", "pysynth_bach_lh.wav", "pysynth_bach.wav")
+
+	make_wav(song3, bpm = 132/2, leg_stac = 0.9, boost = 1.1, fn = "pysynth_chopin.wav")
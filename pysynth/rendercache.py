@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+On-disk cache of rendered songs.
+
+A render is identified by a SHA-1 hash of the song, the engine (its name
+and source code, so editing an engine invalidates its renders) and all
+make_wav() arguments that affect the audio, including the defaults. A
+cache hit returns the stored WAV file without synthesizing anything:
+
+  cache = RenderCache()
+  cache.render(song4_rh, pysynth_b, fn = "bach.wav", bpm = 130)
+  wav = cache.render(song4_rh, pysynth_b, bpm = 130)	# WAV file as a string
+
+The cache directory is limited to max_size bytes; when a new render
+pushes it over the limit, the least recently used renders are deleted.
+
+pysynth_s plucks with random noise, so a cached pysynth_s render is the
+first render of the song and not a fresh one.
+"""
+
+import os, hashlib, inspect, tempfile
+from cStringIO import StringIO
+import tables, timeline, hooks
+import engine as synth_engine
+
+# Default cache directory and size limit
+CACHE_DIR = os.environ.get("PYSYNTH_CACHE",
+	os.path.join(os.path.expanduser("~"), ".cache", "pysynth"))
+MAX_SIZE = 256 * 2**20
+
+# make_wav() arguments that do not change the rendered audio
+IGNORED = ('fn', 'silent', 'threads', 'processes')
+
+_sources = {}
+
+def engine_digest(engine):
+	"Hash of the source code of an engine module and the shared modules."
+	name = engine.__name__
+	if name not in _sources:
+		h = hashlib.sha1()
+		for m in (engine, tables, timeline, synth_engine):
+			h.update(inspect.getsource(m))
+		_sources[name] = h.hexdigest()
+	return _sources[name]
+
+def render_key(song, engine, **options):
+	"Cache key of a song rendered by engine with the given make_wav() options."
+	args = inspect.getcallargs(engine.make_wav, song, **options)
+	args.pop('song')
+	for name in IGNORED:
+		args.pop(name, None)
+	song = [tuple(x) for x in song]
+	text = repr((engine.__name__, engine_digest(engine), song, sorted(args.items())))
+	return hashlib.sha1(text).hexdigest()
+
+class RenderCache(object):
+	"Directory of rendered WAV files with an LRU size limit."
+
+	def __init__(self, path = CACHE_DIR, max_size = MAX_SIZE):
+		self.path = path
+		self.max_size = max_size
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+	def filename(self, key):
+		return os.path.join(self.path, key + ".wav")
+
+	def get(self, key):
+		"Return the cached WAV file for key as a string, or None."
+		fn = self.filename(key)
+		try:
+			with open(fn, 'rb') as f:
+				data = f.read()
+			os.utime(fn, None)	# mark as recently used
+		except (IOError, OSError):
+			return None
+		return data
+
+	def put(self, key, data):
+		"Store a WAV file (string) under key and enforce the size limit."
+		# write to a temporary file first so readers never see a partial file
+		fd, tmp = tempfile.mkstemp(dir = self.path, suffix = ".tmp")
+		with os.fdopen(fd, 'wb') as f:
+			f.write(data)
+		os.rename(tmp, self.filename(key))
+		self.evict()
+
+	def evict(self):
+		"Delete least recently used renders until the cache fits max_size."
+		files = []
+		for name in os.listdir(self.path):
+			if name.endswith(".wav"):
+				try:
+					st = os.stat(os.path.join(self.path, name))
+				except OSError:
+					continue
+				files.append((st.st_mtime, st.st_size, name))
+		total = sum(f[1] for f in files)
+		for mtime, size, name in sorted(files):
+			if total <= self.max_size:
+				break
+			try:
+				os.remove(os.path.join(self.path, name))
+			except OSError:
+				pass
+			total -= size
+
+	def clear(self):
+		for name in os.listdir(self.path):
+			if name.endswith(".wav"):
+				os.remove(os.path.join(self.path, name))
+
+	def render(self, song, engine, fn = None, **options):
+		"""Render song with engine (a PySynth module) unless it is cached.
+
+		Returns the WAV file as a string; if fn is given, it is also
+		written there."""
+		key = render_key(song, engine, **options)
+		data = self.get(key)
+		hooks.count('render_cache_misses' if data is None else 'render_cache_hits')
+		if data is None:
+			buf = StringIO()
+			engine.make_wav(song, fn = buf, **options)
+			data = buf.getvalue()
+			self.put(key, data)
+		if fn is not None:
+			with open(fn, 'wb') as f:
+				f.write(data)
+		return data
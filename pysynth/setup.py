@@ -8,6 +8,6 @@ setup(name="PySynth",
         author="Martin C. Doege",
         author_email="mdoege@compuserve.com",
 	url="http://home.arcor.de/mdoege/pysynth/",
-        py_modules=["pysynth", "pysynth_b", "pysynth_s", "pysynth_e", "pysynth_beeper","play_wav"],
+        py_modules=["pysynth", "pysynth_b", "pysynth_s", "pysynth_e", "pysynth_w", "pysynth_beeper","play_wav", "mixfiles", "multitrack", "tables", "engine", "timeline", "rendercache", "targets", "hooks"],
 	scripts=["read_abc.py", "nokiacomposer2wav.py", "test_nokiacomposer2wav.py", "menv.py", "mixfiles.py"],
 )
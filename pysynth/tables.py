@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+
+"""
+Lookup tables shared by the PySynth engines.
+
+The piano key tables are plain dicts built at import. The NumPy tables
+(harmonics, attack and decay envelopes) are built on first use with
+np.interp and then kept for the lifetime of the process, so importing an
+engine is cheap and make_wav() does no per-call table setup.
+"""
+
+import numpy as np
+from math import log, cos, pi
+
+##########################################################################
+# Render settings
+##########################################################################
+# Full quality sample rate
+RATE = 44100
+
+# Fast previews render at a lower sample rate, cut notes off after
+# PREVIEW_RING seconds and end PREVIEW_TAIL seconds after the last note
+PREVIEW_RATE = 22050
+PREVIEW_RING = 4.
+PREVIEW_TAIL = .5
+
+##########################################################################
+# Piano key frequency and key number tables
+##########################################################################
+pitchhz, keynum = {}, {}
+keyhz = []	# frequency by key number
+keys_s = ('a', 'a#', 'b', 'c', 'c#', 'd', 'd#', 'e', 'f', 'f#', 'g', 'g#')
+keys_f = ('a', 'bb', 'b', 'c', 'db', 'd', 'eb', 'e', 'f', 'gb', 'g', 'ab')
+
+for k in range(88):
+    freq = 27.5 * 2.**(k/12.)
+    keyhz.append(freq)
+    oct = (k+9) // 12
+    note = '%s%u' % (keys_s[k%12], oct)
+    pitchhz[note] = freq
+    keynum[note] = k
+    note = '%s%u' % (keys_f[k%12], oct)
+    pitchhz[note] = freq
+    keynum[note] = k
+
+##########################################################################
+# Envelope and harmonics data
+##########################################################################
+
+# Harmonic intensities (dB) for selected piano keys,
+# measured with output from a Yamaha P-85
+harmo = (
+  (1, -15.8, -3., -15.3, -22.8, -40.7),
+  (16, -15.8, -3., -15.3, -22.8, -40.7),
+  (28, -5.7, -4.4, -17.7, -16., -38.7),
+  (40, -6.8, -17.2, -22.4, -16.8, -75.6),
+  (52, -8.4, -19.7, -23.5, -21.6, -76.8),
+  (64, -9.3, -20.8, -37.2, -36.3, -76.4),
+  (76, -18., -64.5, -74.4, -77.3, -80.8),
+  (88, -24.8, -53.8, -77.2, -80.8, -90.),
+)
+
+# Piano attack envelopes for treble and bass keys, (sample, level)
+att_treb_pts = ((0,0.), (100, .2), (300, .7), (400, .6), (600, .25), (800, .9), (1000, 1.25), (2000,1.15), (3000, 1.))
+att_bass_pts = ((0,0.), (100, .1), (300, .2), (400, .15), (600, .1), (800, .9), (1000, 1.25), (2000,1.15), (3000, 1.))
+
+# Note decay time over log(frequency), (log(Hz), log(s))
+decay_pts = ( (0,log(3)), (3,log(5)), (5, log(1.)), (6, log(.8)), (9,log(.1)) )
+
+def linint(arr, x):
+	"Interpolate an (X, Y) array linearly."
+	for v in arr:
+		if v[0] == x: return v[1]
+	xvals = [v[0] for v in arr]
+	ux = max(xvals)
+	lx = min(xvals)
+	try: assert lx <= x <= ux
+	except:
+		#print lx, x, ux
+		raise
+	for v in arr:
+		if v[0] > x and v[0] - x <= ux - x:
+			ux = v[0]
+			uy = v[1]
+		if v[0] < x and x - v[0] >= lx - x:
+			lx = v[0]
+			ly = v[1]
+	#print lx, ly, ux, uy
+	return (float(x) - lx) / (ux - lx) * (uy - ly) + ly
+
+def volfac(a):
+	"Loudness correction of the piano engines over frequency a (Hz)."
+	lf = log(a)
+	t = (lf-3.) / (8.5-3.)
+	return 1. + .8 * t * cos(pi/5.3*(lf-3.))
+
+def interp(pts, x):
+	"Vectorized linint(): interpolate the (X, Y) pairs in pts at x."
+	pts = np.array(pts, float)
+	return np.interp(x, pts[:,0], pts[:,1])
+
+##########################################################################
+# Lazily built tables
+##########################################################################
+_tables = {}
+
+def lazy(build):
+	"Build a table on the first call (per argument tuple) and reuse it."
+	def get(*args):
+		key = (build.__name__,) + args
+		tab = _tables.get(key)
+		if tab is None:
+			tab = _tables[key] = build(*args)
+			tab.flags.writeable = False
+		return tab
+	get.__name__ = build.__name__
+	get.__doc__ = build.__doc__
+	return get
+
+@lazy
+def harmtab():
+	"Relative harmonic amplitudes, indexed by [key number, harmonic]."
+	h = np.array(harmo, float)
+	tab = np.zeros((88, 20))
+	for n in range(1, h.shape[1]):
+		tab[:,n] = np.interp(np.arange(1, 89), h[:,0], h[:,n])
+	# The original per-key loop scaled column 0 against the fundamental's
+	# dB value, but by then had already set the fundamental to 1., so the
+	# higher harmonics are only offset by 1 dB. The engines are voiced
+	# with these values, so keep them.
+	tab[:,0] = 10.**((tab[:,0] - tab[:,1])/20.)
+	tab[:,1] = 1.
+	tab[:,2:] = 10.**((tab[:,2:] - 1.)/20.)
+	return tab
+
+@lazy
+def attack(rate = RATE):
+	"Piano attack envelopes (treble, bass), 3000 samples long at 44.1 kHz."
+	x = np.arange(int(3000 * rate / 44100.)) * (44100. / rate)
+	return np.array((interp(att_treb_pts, x), interp(att_bass_pts, x)))
+
+@lazy
+def decay():
+	"Note decay times in seconds, indexed by int(100 * log(frequency))."
+	tab = np.zeros(1000)
+	tab[:900] = np.exp(interp(decay_pts, np.arange(900) / 100.))
+	return tab
+
+# Samples per cycle of the wavetables
+WAVETABLE_SIZE = 2048
+
+@lazy
+def wavetable(kn, dtype = np.float64):
+	"""One cycle of the piano tone of key kn as (fundamental, overtones),
+	with the first sample repeated at the end for interpolation."""
+	h = harmtab()[kn]
+	x = 2. * np.pi * np.arange(WAVETABLE_SIZE + 1) / WAVETABLE_SIZE
+	tab = np.array((np.sin(x),
+		h[2] * np.sin(2. * x) + h[3] * np.sin(3. * x)
+		+ h[4] * np.sin(4. * x) + h[5] * np.sin(8. * x)))
+	tab[:,-1] = tab[:,0]
+	return tab.astype(dtype)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""
+Render PySynth songs into memory instead of a WAV file on disk.
+
+Every engine module (pysynth, pysynth_b, pysynth_e, pysynth_s, pysynth_w,
+pysynth_beeper) can be used, with the options of its make_wav():
+
+  samples, rate = render_array(song4_rh, pysynth_b, bpm = 130)
+  wav = render_bytes(song4_rh, pysynth_e)	# the WAV file as a string
+  render_file(song4_rh, pysynth_s, sys.stdout)	# any writable file object
+
+render_array() returns 16-bit sample values. With a float dtype they are
+not rounded; the NumPy engines then skip the WAV encoding altogether.
+"""
+
+import wave, inspect
+from cStringIO import StringIO
+import numpy as np
+
+def render_bytes(song, engine, **options):
+	"Render song with engine (a PySynth module), return the WAV file as a string."
+	buf = StringIO()
+	engine.make_wav(song, fn = buf, **options)
+	return buf.getvalue()
+
+def render_file(song, engine, f, **options):
+	"Render song into the writable file object f, which need not be seekable."
+	f.write(render_bytes(song, engine, **options))
+
+def read_wav(f, dtype = np.short):
+	"Return (samples, frame rate) of a 16-bit WAV file (a file name or object)."
+	w = wave.open(f, 'r')
+	samples = np.frombuffer(w.readframes(w.getnframes()), np.short)
+	return samples.astype(dtype, copy = False), w.getframerate()
+
+def render_array(song, engine, dtype = np.short, **options):
+	"Render song with engine (a PySynth module), return (samples, frame rate)."
+	if not hasattr(engine, 'Engine'):
+		return read_wav(StringIO(render_bytes(song, engine, **options)), dtype)
+
+	# NumPy engines: make_wav() takes the Engine() arguments
+	args = inspect.getcallargs(engine.make_wav, song, **options)
+	del args['song'], args['fn']
+	e = engine.Engine(cache = getattr(engine, 'note_cache', None), **args)
+	data = 32000. * e.render(song)
+	if np.issubdtype(dtype, np.integer):
+		samples = np.zeros(len(data), dtype)
+		samples[:] = data	# truncated like in the WAV file
+	else:
+		samples = data.astype(dtype)
+	return samples, e.rate
@@ -0,0 +1,78 @@
+import threading
+from unittest import TestCase
+
+import numpy as np
+
+import pysynth_b, pysynth_e, pysynth_s
+from engine import NoteCache, Incremental, resample
+
+SONG = (('c', 8), ('e5*', 8), ('c', 8), ('r', -4), ('g6', 4), ('c', 8))
+
+class TestEngine(TestCase):
+    def test_concurrent_renders(self):
+        # engines with different settings sharing one cache, in parallel
+        cache = NoteCache()
+        engines = [pysynth_b.Engine(silent = True, transpose = t, cache = cache)
+                   for t in (0, 1)] + [pysynth_e.Engine(silent = True, cache = cache)]
+        ref = [e.render(SONG) for e in engines]
+        out = [None] * len(engines)
+        def run(n):
+            out[n] = engines[n].render(SONG)
+        threads = [threading.Thread(target = run, args = (n,)) for n in range(len(engines))]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        for r, o in zip(ref, out):
+            self.assertTrue(np.array_equal(r, o))
+        self.assertFalse(np.array_equal(ref[0], ref[1]))
+
+    def test_dotted_rest(self):
+        e = pysynth_b.Engine(silent = True)
+        self.assertEqual(len(e.render([('c', 4), ('r', -4)])),
+                         int(e.tail * e.rate + 2.5 * e.rate / 2 + .5))
+
+    def test_threads(self):
+        for m in (pysynth_b, pysynth_e):
+            ref = m.Engine(silent = True, repeat = 1).render(SONG)
+            out = m.Engine(silent = True, repeat = 1, threads = 3).render(SONG)
+            self.assertTrue(np.array_equal(ref, out))
+
+    def test_processes(self):
+        for m in (pysynth_b, pysynth_e, pysynth_s):
+            np.random.seed(0)
+            ref = m.Engine(silent = True).render(SONG)
+            np.random.seed(0)
+            out = m.Engine(silent = True, processes = 2).render(SONG)
+            self.assertEqual(len(ref), len(out))
+            # segments are summed in a different order, so allow rounding
+            self.assertLess(np.abs(ref - out).max(), 1e-6)
+        # the tail of a low note runs past the end of the song buffer
+        song = [('c4', 4), ('g1', 1)]
+        np.random.seed(0)
+        ref = pysynth_s.Engine(silent = True).render(song)
+        np.random.seed(0)
+        out = pysynth_s.Engine(silent = True, processes = 2).render(song)
+        self.assertEqual(len(ref), len(out))
+        self.assertLess(np.abs(ref - out).max(), 1e-6)
+
+    def test_incremental(self):
+        inc = Incremental(pysynth_b.Engine(silent = True))
+        song = list(SONG)
+        inc.render(song)
+        song[1] = ('f5', 8)
+        out = inc.render(song)
+        self.assertEqual(inc.span, (11025, 11025))    # after one eighth
+        ref = pysynth_b.Engine(silent = True).render(song)
+        self.assertEqual(len(ref), len(out))
+        self.assertLess(np.abs(ref - out).max(), 1e-6)
+
+    def test_resample(self):
+        x = np.sin(np.arange(1000) * .1)
+        self.assertTrue(np.allclose(resample(x, 1., 500), x[:500]))
+        # reading at 3/4 speed gives a 3/4 times lower tone
+        self.assertLess(np.abs(resample(x, .75, 1000) - np.sin(np.arange(1000) * .075)).max(), 5e-3)
+
+    def test_resample_engine(self):
+        ref = pysynth_b.Engine(silent = True).render(SONG)
+        out = pysynth_b.Engine(silent = True, resample = 3).render(SONG)
+        self.assertEqual(len(ref), len(out))
+        self.assertLess(((out - ref) ** 2).mean() / (ref ** 2).mean(), .01)
@@ -0,0 +1,73 @@
+import os, shutil, tempfile
+from contextlib import contextmanager
+from unittest import TestCase
+
+import hooks, pysynth, pysynth_b
+from multitrack import render_tracks
+
+SONG = (('c', 8), ('e5*', 8), ('g', 4))
+BASS = (('c3', 4), ('g2', 4))
+
+class Recorder(object):
+    "Minimal recorder: counters and the number of runs of every stage."
+    enabled = True
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.runs = {}
+
+    def count(self, name, n = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def timer(self, name):
+        try:
+            yield
+        finally:
+            self.count(name, 0)
+            self.runs[name] = self.runs.get(name, 0) + 1
+
+    def snapshot(self):
+        return self.counters.copy(), self.runs.copy()
+
+    def merge(self, snap):
+        for name, n in snap[0].items():
+            self.count(name, n)
+        for name, n in snap[1].items():
+            self.runs[name] = self.runs.get(name, 0) + n
+
+class TestHooks(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.recorder = Recorder()
+        hooks.install(self.recorder)
+
+    def tearDown(self):
+        hooks.install(None)
+        shutil.rmtree(self.dir)
+
+    def test_make_wav(self):
+        pysynth.make_wav(SONG, fn = os.path.join(self.dir, "a.wav"), silent = True, preview = True)
+        self.assertEqual(self.recorder.runs, {'make_wav': 1})
+        self.assertEqual(self.recorder.counters['notes_rendered'], 3)
+        # a failed render is timed as well
+        self.assertRaises(KeyError, pysynth.make_wav, (('c', 4), ('x9', 4)),
+                          fn = os.path.join(self.dir, "b.wav"), silent = True)
+        self.assertEqual(self.recorder.runs['make_wav'], 2)
+
+    def test_workers(self):
+        # the counts of the worker processes are merged into the parent's
+        tracks = [(SONG, pysynth_b, 1., .4), (BASS, pysynth, 1., -.4)]
+        render_tracks(tracks, fn = os.path.join(self.dir, "a.wav"), silent = True,
+                      preview = True, processes = 2)
+        self.assertEqual(self.recorder.counters['notes_rendered'], 5)
+        self.assertEqual(self.recorder.runs['render_tracks'], 1)
+        self.assertEqual(self.recorder.runs['mix'], 1)
+
+    def test_no_recorder(self):
+        hooks.install(None)
+        pysynth.make_wav(SONG, fn = os.path.join(self.dir, "a.wav"), silent = True, preview = True)
+        self.assertEqual(self.recorder.runs, {})
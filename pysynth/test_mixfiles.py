@@ -0,0 +1,54 @@
+import os, shutil, tempfile, wave
+from unittest import TestCase
+
+import numpy as np
+
+from mixfiles import mix, mix_files
+
+def write(fn, samples, chann = 1):
+    f = wave.open(fn, 'w')
+    f.setnchannels(chann)
+    f.setsampwidth(2)
+    f.setframerate(44100)
+    f.writeframes(np.array(samples, np.short).tostring())
+    f.close()
+
+def read(fn):
+    f = wave.open(fn, 'r')
+    d = np.frombuffer(f.readframes(f.getnframes()), np.short)
+    return d.reshape(-1, f.getnchannels())
+
+class TestMixFiles(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.a = os.path.join(self.dir, "a.wav")
+        self.b = os.path.join(self.dir, "b.wav")
+        self.c = os.path.join(self.dir, "c.wav")
+        write(self.a, [1000, -2000, 3000, 100])
+        write(self.b, [500, 500, -500])
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_two_file_stereo(self):
+        # a is panned right, b left, far side phase inverted
+        mix_files(self.a, self.b, self.c)
+        self.assertEqual(read(self.c).tolist(),
+            [[50, 550], [950, -1550], [-1250, 2250]])
+
+    def test_two_file_mono(self):
+        mix_files(self.a, self.b, self.c, chann = 1)
+        self.assertEqual(read(self.c).tolist(), [[750], [-750], [1250]])
+
+    def test_gain_pan_pad(self):
+        mix([(self.a, 2., 1.), (self.b, 1., -1.)], self.c, pad = True, chunk = 2)
+        self.assertEqual(read(self.c).tolist(),
+            [[500, 2000], [500, -4000], [-500, 6000], [0, 200]])
+
+    def test_clipping(self):
+        mix([(self.a, 40., 1.)], self.c)
+        self.assertEqual(read(self.c)[:, 1].tolist(), [32767, -32768, 32767, 4000])
+
+    def test_rejects_stereo_input(self):
+        write(self.b, [0, 0], chann = 2)
+        self.assertRaises(ValueError, mix, [self.a, self.b], self.c)
@@ -0,0 +1,26 @@
+import os, shutil, tempfile
+from unittest import TestCase
+
+import pysynth, pysynth_b
+from multitrack import render_tracks
+
+SONG = (('c', 8), ('e5*', 8), ('g', 4))
+BASS = (('c3', 4), ('g2', 4))
+
+class TestMultitrack(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_processes(self):
+        # tracks rendered in worker processes mix to the same file
+        tracks = [(SONG, pysynth_b, 1., .4), (BASS, pysynth, 1., -.4)]
+        wavs = []
+        for processes in (1, 2):
+            fn = os.path.join(self.dir, "%u.wav" % processes)
+            render_tracks(tracks, fn = fn, silent = True, preview = True,
+                          processes = processes)
+            wavs.append(open(fn, 'rb').read())
+        self.assertEqual(wavs[0], wavs[1])
@@ -0,0 +1,45 @@
+import wave
+from cStringIO import StringIO
+from unittest import TestCase
+
+import numpy as np
+
+import pysynth_b, pysynth_e, pysynth_s, pysynth_w
+
+SONG = (('c', 8), ('e5*', 8), ('g6', 4), ('c2', 4))
+
+def render(engine, precision):
+    np.random.seed(0)    # pysynth_s plucks with random noise
+    buf = StringIO()
+    engine.make_wav(SONG, fn = buf, silent = True, precision = precision)
+    buf.seek(0)
+    f = wave.open(buf, 'r')
+    return np.frombuffer(f.readframes(f.getnframes()), np.short).astype(float)
+
+class TestPrecision(TestCase):
+    def assertInaudible(self, engine):
+        ref = render(engine, np.float64)
+        out = render(engine, np.float32)
+        self.assertEqual(len(ref), len(out))
+        # at most a couple of LSBs off, error at least 90 dB below the signal
+        self.assertLessEqual(np.abs(ref - out).max(), 2)
+        err_db = 10 * np.log10(((ref - out) ** 2).mean() / (ref ** 2).mean())
+        self.assertLess(err_db, -90)
+
+    def test_piano(self):
+        self.assertInaudible(pysynth_b)
+
+    def test_fm_piano(self):
+        self.assertInaudible(pysynth_e)
+
+    def test_string(self):
+        self.assertInaudible(pysynth_s)
+
+    def test_wavetable_piano(self):
+        self.assertInaudible(pysynth_w)
+
+    def test_wavetable_matches_piano(self):
+        ref = render(pysynth_b, np.float64)
+        out = render(pysynth_w, np.float64)
+        self.assertEqual(len(ref), len(out))
+        self.assertLessEqual(np.abs(ref - out).max(), 2)
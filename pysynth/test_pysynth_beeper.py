@@ -0,0 +1,29 @@
+import wave
+from cStringIO import StringIO
+from unittest import TestCase
+
+import numpy as np
+
+import pysynth_beeper
+
+def render(song, **kw):
+    buf = StringIO()
+    pysynth_beeper.make_wav(song, fn = buf, **kw)
+    buf.seek(0)
+    f = wave.open(buf, 'r')
+    return np.frombuffer(f.readframes(f.getnframes()), np.short)
+
+class TestBeeper(TestCase):
+    def test_note_lengths(self):
+        # a quarter at 120 bpm is 22050 samples, rests are silent
+        out = render([('a4', 4), ('r', 8), ('a4', 8)])
+        self.assertEqual(len(out), 22050 + 2 * 11025)
+        self.assertFalse(out[22050:33075].any())
+
+    def test_periods_and_fades(self):
+        out = render([('a4', 4)])
+        period = int(44100 / 4 / 440.)
+        middle = out[1000:1000 + 3 * period].reshape(3, period)
+        self.assertTrue((middle == middle[0]).all())
+        self.assertEqual(out[0], 0)
+        self.assertLess(np.abs(out[:10]).max(), np.abs(middle).max() / 5)
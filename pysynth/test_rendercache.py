@@ -0,0 +1,41 @@
+import os, shutil, tempfile
+from unittest import TestCase
+
+import pysynth_b, pysynth_e
+from rendercache import RenderCache, render_key
+
+SONG = (('c', 8), ('e5*', 8), ('g', 4))
+
+class TestRenderCache(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache = RenderCache(self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_keys(self):
+        key = render_key(SONG, pysynth_b)
+        self.assertEqual(key, render_key(list(SONG), pysynth_b, bpm = 120, silent = True))
+        self.assertNotEqual(key, render_key(SONG, pysynth_b, bpm = 121))
+        self.assertNotEqual(key, render_key(SONG, pysynth_e))
+        self.assertNotEqual(key, render_key(SONG[:2], pysynth_b))
+
+    def test_hit(self):
+        wav = self.cache.render(SONG, pysynth_b, silent = True, preview = True)
+        key = render_key(SONG, pysynth_b, preview = True)
+        self.assertEqual(self.cache.get(key), wav)
+        # a hit returns the stored file without rendering
+        self.cache.put(key, "cached")
+        fn = os.path.join(self.dir, "out")
+        self.assertEqual(self.cache.render(SONG, pysynth_b, fn = fn, preview = True), "cached")
+        self.assertEqual(open(fn, 'rb').read(), "cached")
+
+    def test_lru_eviction(self):
+        for n, key in enumerate(("a", "b", "c")):
+            self.cache.put(key, "x" * 10)
+            os.utime(self.cache.filename(key), (n, n))
+        self.cache.max_size = 25
+        self.cache.get("a")        # a is now the most recently used
+        self.cache.put("d", "x" * 10)
+        self.assertEqual([k for k in "abcd" if self.cache.get(k)], ["a", "d"])
@@ -0,0 +1,41 @@
+import wave
+from cStringIO import StringIO
+from unittest import TestCase
+
+import numpy as np
+
+import pysynth, pysynth_b, pysynth_beeper
+from targets import render_array, render_bytes, render_file, read_wav
+
+SONG = (('c', 8), ('e5*', 8), ('g', 4))
+
+class NonSeekable(object):
+    def __init__(self):
+        self.data = []
+    def write(self, s):
+        self.data.append(s)
+
+class TestTargets(TestCase):
+    def test_array_matches_wav(self):
+        # pysynth_beeper wants the octave in every note
+        for engine, song, options in ((pysynth_b, SONG, {'silent': True}),
+                                      (pysynth, SONG, {'silent': True}),
+                                      (pysynth_beeper, (('c4', 8), ('g4', 4)), {})):
+            wav = render_bytes(song, engine, **options)
+            ref, rate = read_wav(StringIO(wav))
+            out, r = render_array(song, engine, **options)
+            self.assertEqual(r, rate)
+            self.assertTrue(np.array_equal(out, ref))
+
+    def test_float_array(self):
+        ref, rate = render_array(SONG, pysynth_b, silent = True, preview = True)
+        out, r = render_array(SONG, pysynth_b, np.float32, silent = True, preview = True)
+        self.assertEqual(out.dtype, np.float32)
+        self.assertEqual(r, 22050)
+        self.assertLess(np.abs(out - ref).max(), 1.)
+
+    def test_file(self):
+        f = NonSeekable()
+        render_file(SONG, pysynth_b, f, silent = True)
+        w = wave.open(StringIO("".join(f.data)), 'r')
+        self.assertEqual(w.getnframes(), len(render_array(SONG, pysynth_b, silent = True)[0]))
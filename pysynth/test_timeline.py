@@ -0,0 +1,38 @@
+from unittest import TestCase
+
+import pysynth
+from timeline import compile_song, parse_note
+from targets import render_array
+
+SONG = (('c', 4), ('r', -4), ('e5*', 8), ('db', 2))
+
+class TestTimeline(TestCase):
+    def test_compile(self):
+        tl = compile_song(SONG, bpm = 60, rate = 1000, repeat = 1, boost = 1.5)
+        q = 1000.    # quarter note at 60 bpm and 1000 Hz
+        self.assertEqual(tl.end, 2 * (q + 1.5 * q + q / 2 + 2 * q))
+        self.assertEqual(tl.events['start'].tolist(), [0, 2500, 3000, 5000, 7500, 8000])
+        self.assertEqual(tl.events['length'].tolist()[:3], [q, q / 2, 2 * q])
+        self.assertEqual(tl.events['key'].tolist()[:3], [39, 55, 40])
+        self.assertEqual(tl.events['vol'].tolist()[:3], [1., 1.5, 1.])
+
+    def test_parse_note(self):
+        self.assertEqual(parse_note('c#'), parse_note('db4'))
+        self.assertEqual(parse_note('a0*', boost = 2.), (0, 2.))
+
+    def test_between(self):
+        tl = compile_song(SONG, bpm = 60, rate = 1000, repeat = 1)
+        self.assertEqual(tl.events['start'][tl.between(2500, 7500)].tolist(), [2500, 3000, 5000])
+
+    def test_engine_a_starts(self):
+        # pysynth starts every note on its timeline sample, also after
+        # rests whose lengths are not whole samples (before the timeline
+        # each rest was cut to whole samples, so 30529 and 50883 here)
+        song = (('c', 4), ('r', 8), ('e', 8), ('r', 16), ('r', 16), ('g', 4))
+        starts = compile_song(song, bpm = 130).events['start'].tolist()
+        self.assertEqual(starts, [0, 30530, 50884])
+        out, rate = render_array(song, pysynth, bpm = 130, silent = True)
+        for s in starts[1:]:
+            # silence, then the attack, which is 0 on the note's first sample
+            self.assertEqual(out[s-1:s+1].tolist(), [0, 0])
+            self.assertNotEqual(out[s+1], 0)
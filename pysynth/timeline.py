@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+Compiled song timelines.
+
+compile_song() turns a PySynth song, a list of (note, value) tuples, into
+a Timeline: a NumPy record array with one row per note (rests only move
+the clock) and the length of the whole song in samples. The rows are
+
+  start   first sample of the note
+  length  length of the note value in samples (float)
+  key     piano key number (0 = a0, 87 = c8)
+  vol     volume, 1. or the boost of accented notes ('c4*')
+
+The note strings are parsed once per distinct note and the start samples
+are the running sum of the note lengths, so the result is the same as
+advancing a float position note by note, including over repeats.
+
+  tl = compile_song(song4_rh, bpm = 130, repeat = 1)
+  tl.events['start'][tl.between(44100, 88200)]	# notes in the 2nd second
+"""
+
+import numpy as np
+from tables import keynum, RATE
+
+EVENT = np.dtype([('start', np.int64), ('length', float), ('key', np.int16), ('vol', float)])
+
+class Timeline(object):
+	"Note events of a song at a fixed bpm and sample rate."
+
+	def __init__(self, events, end, rate = RATE):
+		self.events = events	# EVENT record array, sorted by start
+		self.end = end		# song length in samples (float)
+		self.rate = rate
+
+	def __len__(self):
+		return len(self.events)
+
+	def between(self, start, stop):
+		"Slice of the events starting at a sample in [start, stop)."
+		s = self.events['start']
+		return slice(np.searchsorted(s, start), np.searchsorted(s, stop))
+
+def parse_note(note, boost = 1.1):
+	"Return (key number, volume) of a note string like 'c#5*' or 'eb'."
+	vol = 1.
+	if note[-1] == '*':
+		note, vol = note[:-1], boost
+	if not note[-1].isdigit():
+		note += '4'		# default to fourth octave
+	return keynum[note], vol
+
+def compile_song(song, bpm = 120, rate = RATE, repeat = 0, boost = 1.1):
+	"Compile a song (played repeat+1 times) into a Timeline."
+	values = np.array([x[1] for x in song], float)
+	# dotted notes: -4 = dotted quarter = 4/1.5
+	values = np.where(values < 0, -2. * values / 3., values)
+	lengths = np.tile(2. * rate / values * 120. / bpm, repeat+1)
+	ends = np.cumsum(lengths)
+	starts = np.concatenate(([0.], ends[:-1]))
+
+	parsed = {}
+	keys, vols, notes = [], [], []
+	for n, x in enumerate(song):
+		if x[0] != 'r':
+			if x[0] not in parsed:
+				parsed[x[0]] = parse_note(x[0], boost)
+			k, v = parsed[x[0]]
+			keys.append(k)
+			vols.append(v)
+			notes.append(n)
+	idx = (np.array(notes, int) + len(song) * np.arange(repeat+1)[:,None]).ravel()
+
+	events = np.zeros(len(idx), EVENT)
+	events['start'] = starts[idx]
+	events['length'] = lengths[idx]
+	events['key'] = np.tile(keys, repeat+1)
+	events['vol'] = np.tile(vols, repeat+1)
+	return Timeline(events, ends[-1] if len(ends) else 0., rate)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python
+"""
+Local HTTP/JSON service around generate.py, with the models loaded once.
+
+    python server.py --port 8183 --workers 4 --models models.pkl
+
+trains the models (or reads them from --models) at startup and then
+answers GET requests on 127.0.0.1 only:
+
+    /lyrics?seed=7                   {"seed": 7, "verses": [...], "text": "..."}
+    /song?seed=7&key=c+major         {"seed": 7, "key": "c major",
+                                      "melody": [["c4", 4], ...],
+                                      "bassline": [["c2", 2], ...]}
+    /wav?seed=7&engine=w&preview=1   the song rendered as audio/wav
+    /health                          {"status": "ok", "workers": 4, ...}
+    /metrics                         stage timings and request counters in
+                                     the Prometheus text format
+    /metrics.json                    the same as JSON
+
+A seed always gives the same lyrics, song or audio, the same as batch.py
+--lyrics-only or --music-only with that seed; without a seed a random one
+is used and returned (in the X-Seed header for /wav). key is random when
+not given, engine is a letter of generate.ENGINES (default a).
+
+Requests are handled by a fixed pool of --workers threads. Up to --queue
+more wait for a worker; beyond that the server answers 503 at once
+instead of piling up threads. The generation itself takes milliseconds
+and runs one request at a time (it shares the random module); the
+rendering of /wav runs in parallel, except for the engines in
+NOISY_ENGINES, which render one at a time (they share numpy's random
+noise).
+"""
+import sys
+sys.dont_write_bytecode = True # Suppress .pyc files
+import json
+import Queue
+import random
+import argparse
+import threading
+import traceback
+import urlparse
+import BaseHTTPServer
+from cStringIO import StringIO
+import generate
+from generate import KEY_SIGNATURES
+import metrics
+
+HOST = '127.0.0.1'
+
+# engines drawing from numpy's global random state: pysynth_s plucks its
+# strings with random noise
+NOISY_ENGINES = ['s']
+
+# endpoints timed and counted in /metrics
+ENDPOINTS = ['/health', '/lyrics', '/song', '/wav', '/metrics',
+             '/metrics.json']
+
+class BadRequest(Exception):
+    pass
+
+class GenerationService(object):
+    """
+    The models and the generation functions behind the HTTP endpoints.
+    """
+
+    def __init__(self, lyricModels, musicModels):
+        """
+        Requires: lyricModels and musicModels are lists of trained models
+        Modifies: self
+        Effects:  creates a service generating with these models.
+        """
+        self.lyricModels = lyricModels
+        self.musicModels = musicModels
+        self.lock = threading.Lock()
+        self.noiseLock = threading.Lock()
+        self.seeds = random.Random()
+
+    def seed(self, seed):
+        """
+        Requires: seed is None or a str from the query string
+        Modifies: nothing
+        Effects:  returns seed as an int, or a new random seed for None.
+        """
+        if seed is None:
+            with self.lock:
+                return self.seeds.randint(0, 2**31 - 1)
+        try:
+            return int(seed)
+        except ValueError:
+            raise BadRequest('seed must be an integer')
+
+    def lyrics(self, seed):
+        """
+        Requires: seed is an int
+        Modifies: the state of the random module
+        Effects:  returns the lyrics for seed as a JSON-ready dict.
+        """
+        with self.lock:
+            random.seed(seed)
+            verses = generate.generateLyrics(self.lyricModels)
+        return {'seed': seed, 'verses': verses,
+                'text': generate.formatSongLyrics(*verses)}
+
+    def song(self, seed, key=None):
+        """
+        Requires: seed is an int, key is None or a key of KEY_SIGNATURES
+        Modifies: the state of the random module
+        Effects:  returns the song for seed as a JSON-ready dict.
+        """
+        if key is not None and key not in KEY_SIGNATURES:
+            raise BadRequest('unknown key %r' % key)
+        with self.lock:
+            random.seed(seed)
+            key, melody, bassline = generate.generateSong(self.musicModels,
+                                                          key)
+        return {'seed': seed, 'key': key, 'melody': melody,
+                'bassline': bassline}
+
+    def wav(self, seed, key=None, engine='a', preview=False):
+        """
+        Requires: the same as song(), engine is a key of generate.ENGINES
+        Modifies: the state of the random module and of numpy.random
+        Effects:  returns the song for seed rendered as a .wav file (str).
+        """
+        if engine not in generate.ENGINES:
+            raise BadRequest('unknown engine %r' % engine)
+        song = self.song(seed, key)
+        out = StringIO()
+        render = lambda: generate.renderSong(song['melody'], song['bassline'],
+                                             out, generate.loadEngine(engine),
+                                             preview, silent=True)
+        if engine in NOISY_ENGINES:
+            import numpy as np
+            # seeded like batch.py; the whole render draws from it
+            with self.noiseLock:
+                np.random.seed(seed % 2**32)
+                render()
+        else:
+            render()
+        return out.getvalue()
+
+class RequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        query = dict((name, values[-1]) for name, values
+                     in urlparse.parse_qs(url.query).items())
+        service = self.server.service
+        if url.path in ENDPOINTS:
+            endpoint = url.path[1:].replace('.', '_')
+            metrics.count('requests_' + endpoint)
+            with metrics.timer('request_' + endpoint):
+                self.respond(url, query, service)
+        else:
+            metrics.count('requests_unknown')
+            self.sendJson(404, {'error': 'no such endpoint'})
+
+    def respond(self, url, query, service):
+        try:
+            if url.path == '/health':
+                self.sendJson(200, {'status': 'ok',
+                                    'workers': len(self.server.workers),
+                                    'queued': self.server.queue.qsize()})
+            elif url.path == '/lyrics':
+                self.sendJson(200, service.lyrics(
+                    service.seed(query.get('seed'))))
+            elif url.path == '/song':
+                self.sendJson(200, service.song(
+                    service.seed(query.get('seed')), query.get('key')))
+            elif url.path == '/wav':
+                seed = service.seed(query.get('seed'))
+                data = service.wav(seed, query.get('key'),
+                                   query.get('engine', 'a'),
+                                   query.get('preview', '0') not in
+                                   ('', '0', 'false'))
+                self.send(200, 'audio/wav', data, [('X-Seed', str(seed))])
+            elif url.path == '/metrics':
+                self.send(200, 'text/plain; version=0.0.4',
+                          metrics.prometheus())
+            elif url.path == '/metrics.json':
+                self.sendJson(200, metrics.snapshot())
+        except BadRequest as e:
+            metrics.count('errors_400')
+            self.sendJson(400, {'error': str(e)})
+        except Exception as e:
+            metrics.count('errors_500')
+            traceback.print_exc()
+            self.sendJson(500, {'error': str(e)})
+
+    def send(self, code, contentType, data, headers=()):
+        self.send_response(code)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def sendJson(self, code, obj):
+        self.send(code, 'application/json', json.dumps(obj))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPServer.BaseHTTPRequestHandler.log_message(self, format,
+                                                              *args)
+
+BUSY = ('HTTP/1.0 503 Service Unavailable\r\n'
+        'Content-Type: application/json\r\n'
+        'Content-Length: 27\r\n\r\n'
+        '{"error": "server is busy"}')
+
+class PooledHTTPServer(BaseHTTPServer.HTTPServer):
+    """
+    HTTP server handling requests in a fixed number of worker threads, with
+    a bounded queue of waiting requests.
+    """
+
+    def __init__(self, address, service, workers=4, queue=16, verbose=False):
+        """
+        Requires: address is a (host, port) tuple
+                  service is a GenerationService
+        Modifies: self
+        Effects:  binds the server and starts the worker threads.
+        """
+        BaseHTTPServer.HTTPServer.__init__(self, address, RequestHandler)
+        self.service = service
+        self.verbose = verbose
+        self.queue = Queue.Queue(queue)
+        self.workers = [threading.Thread(target=self.work)
+                        for i in range(workers)]
+        for worker in self.workers:
+            worker.daemon = True
+            worker.start()
+
+    def process_request(self, request, client_address):
+        # called by serve_forever() for every connection
+        try:
+            self.queue.put_nowait((request, client_address))
+        except Queue.Full:
+            metrics.count('errors_503')
+            try:
+                request.sendall(BUSY)
+            finally:
+                self.shutdown_request(request)
+
+    def work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        BaseHTTPServer.HTTPServer.server_close(self)
+        for worker in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--port', type=int, default=8183,
+                        help='port on 127.0.0.1 (default 8183)')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='worker threads (default 4)')
+    parser.add_argument('--queue', type=int, default=16,
+                        help='requests waiting for a worker before the '
+                        'server answers 503 (default 16)')
+    parser.add_argument('--models', metavar='FILE',
+                        help='read the trained models from FILE, or train '
+                        'them and save them there')
+    parser.add_argument('--verbose', action='store_true',
+                        help='log every request')
+    options = parser.parse_args(argv)
+
+    metrics.enable()
+    print 'Loading models...'
+    service = GenerationService(*generate.loadModels(options.models))
+    server = PooledHTTPServer((HOST, options.port), service, options.workers,
+                              options.queue, options.verbose)
+    print 'Serving on http://%s:%d/' % server.server_address
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+import sys
+sys.dont_write_bytecode = True # Suppress .pyc files
+from unittest import TestCase
+
+import generate
+from models.musicInfo import MIDI_NOTES, MIDI_NAMES
+
+def oldMidiNoteToInt(note):
+    """
+    Requires: note is a string of form 'c4', 'd#6', 'b0', etc
+    Modifies: nothing
+    Effects:  the string parsing MidiNoteToInt used before MIDI_NOTES,
+              kept as the reference for the table.
+    """
+    notes = ['c', 'd', 'e', 'f', 'g', 'a', 'b']
+    int_note = 0
+    if (0 <= int(note[-1]) <= 10) and ('a' <= note[0] <= 'g'):
+        int_note += int(note[-1]) * 12
+        for i in range(len(notes)):
+            if note[0] == notes[i]:
+                int_note += i * 2
+                if note[0] == 'f' or note[0] == 'g' or note[0] == 'a' or note[0] == 'b':
+                    int_note -= 1
+        if note[1] == '#':
+            int_note += 1
+        elif note[1] == 'b':
+            int_note -= 1
+    else:
+        return 'Invalid note'
+    return int_note
+
+class TestMidiNotes(TestCase):
+    def test_old_spellings(self):
+        # every note the old parser understood: a letter, an optional
+        # sharp or flat and a one digit octave
+        notes = ['%s%s%d' % (letter, accidental, octave)
+                 for letter in 'abcdefg'
+                 for accidental in ('', '#', 'b')
+                 for octave in range(10)]
+        for note in notes:
+            self.assertEqual(MIDI_NOTES[note], oldMidiNoteToInt(note), note)
+            self.assertEqual(generate.MidiNoteToInt(note), MIDI_NOTES[note])
+
+    def test_names(self):
+        for midi, name in enumerate(MIDI_NAMES):
+            self.assertEqual(MIDI_NOTES[name], midi)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, generate.MidiNoteToInt, 'h4')
+        self.assertRaises(ValueError, generate.songToMidi,
+                          [('c4', 8), ('h4', 8)])
+        pitches, durations = generate.songToMidi([('c4', 8), ('e', 4)])
+        self.assertEqual(pitches.tolist(), [48, 52])
+        self.assertEqual(durations.tolist(), [8, 4])
@@ -0,0 +1,45 @@
+import os
+import sys
+sys.dont_write_bytecode = True # Suppress .pyc files
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+import batch
+import generate
+import server
+
+class TestGenerationService(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.service = server.GenerationService(*generate.loadModels())
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_noisy_wav(self):
+        # pysynth_s plucks with numpy's random noise: a seed still gives
+        # the same audio, also for concurrent requests, and the same as
+        # batch.py
+        wavs = []
+        threads = [threading.Thread(target=lambda: wavs.append(
+                       self.service.wav(7, None, 's', True)))
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(wavs), 2)
+        self.assertEqual(wavs[0], wavs[1])
+
+        batch.lyricModels = self.service.lyricModels
+        batch.musicModels = self.service.musicModels
+        options = batch.parseArgs(['--music-only', '--engine', 's',
+                                   '--preview', '--outdir', self.dir])
+        batch.generateOne((7, options))
+        with open(os.path.join(self.dir, 'song_7.wav'), 'rb') as f:
+            self.assertEqual(f.read(), wavs[0])